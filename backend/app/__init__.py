@@ -1,30 +1,45 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_cors import CORS
 from datetime import timedelta
+import logging
+import time
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 
 def create_app():
+    started = time.perf_counter()
     app = Flask(__name__)
     app.config.from_object('config.Config')
     
-    CORS(app,
-         resources={
-             r"/*": {
-                 "origins": ["http://localhost:3000"],
-                 "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-                 "allow_headers": ["Content-Type", "Accept"],
-                 "supports_credentials": True,
-                 "expose_headers": ["Set-Cookie"]
-             }
-         })
+    from .cors import init_cors
+    init_cors(app)
 
+    from .logs import init_logging
+    init_logging(app)
+    log = logging.getLogger(__name__)
+    from .serialize import JSONProvider
+    app.json = JSONProvider(app)
+    from .metrics import init_metrics
+    init_metrics(app)
+    # Registered after metrics so that its after_request hook runs first and is timed
+    from .compression import init_compression
+    init_compression(app)
+
+    from .storage import configure_engine_options, init_storage
+    configure_engine_options(app)
     db.init_app(app)
+    from .cache import init_list_cache, init_identity_cache
+    init_list_cache(app)
+    init_identity_cache(app)
+    from .passwords import init_password_hasher
+    init_password_hasher(app)
     login_manager.init_app(app)
     login_manager.login_view = 'login'
+
+    from .commands import register_commands
+    register_commands(app)
     
     # Configure session handling with more permissive settings for development
     app.config.update(
@@ -39,13 +54,15 @@ def create_app():
     )
     
     with app.app_context():
+        init_storage(app)
         from . import routes, models
-        print("Creating database tables...") # Debug print
-        db.create_all()
-        print("Database tables created successfully") # Debug print
-        # Print existing users
-        from .models import User
-        users = User.query.all()
-        print(f"Existing users: {[user.username for user in users]}") # Debug print
+        from .migrations import ensure_schema
+        applied = ensure_schema(app)
+        if applied:
+            log.info(f"Applied schema migrations {applied}")
 
-    return app
\ No newline at end of file
+    from .logs import log_event
+    app.extensions['startup_seconds'] = time.perf_counter() - started
+    log_event(log, logging.INFO, 'app started',
+              startup_ms=round(app.extensions['startup_seconds'] * 1000, 2))
+    return app
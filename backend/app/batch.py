@@ -0,0 +1,192 @@
+from . import db, operations
+from .models import TodoList, TodoItem
+from .operations import OperationError
+
+
+class BatchError(OperationError):
+    """An operation in a batch failed; ``index`` points at it in the request."""
+
+    def __init__(self, index, message, status=400):
+        super().__init__(message, status)
+        self.index = index
+
+
+# Keys of an operation that name an item (or a client id) and a list
+_ITEM_KEYS = ('item_id', 'parent_id', 'after_id')
+_LIST_KEYS = ('list_id', 'target_list_id')
+_TEXT_KEYS = ('description', 'name')
+
+
+def apply_batch(user_id, ops):
+    """Apply an ordered list of operations for ``user_id`` without committing.
+
+    Every item and list referenced by the batch is loaded up front in two
+    queries and ownership is checked once per list. ``create`` operations
+    may carry a ``client_id``, a string unique within the batch, that later
+    operations use in place of an item id, e.g. as the ``parent_id`` of
+    another ``create``.
+
+    Returns one result dict per operation. Raises ``BatchError`` on the
+    first operation that cannot be applied; the caller rolls back.
+    """
+    client_ids = set()
+    for index, op in enumerate(ops):
+        if not isinstance(op, dict):
+            raise BatchError(index, 'Each operation must be an object')
+        # Checked before any value reaches a query or the ORM
+        for key in _ITEM_KEYS:
+            value = op.get(key)
+            if value is not None and not (_is_id(value) or isinstance(value, str)):
+                raise BatchError(index, f'{key} must be an item id or a client_id')
+        for key in _LIST_KEYS:
+            value = op.get(key)
+            if value is not None and not _is_id(value):
+                raise BatchError(index, f'{key} must be a list id')
+        for key in _TEXT_KEYS:
+            if key in op and not isinstance(op[key], str):
+                raise BatchError(index, f'{key} must be a string')
+        client_id = op.get('client_id')
+        if client_id is not None:
+            if not isinstance(client_id, str) or not client_id:
+                raise BatchError(index, 'client_id must be a non-empty string')
+            if client_id in client_ids:
+                raise BatchError(index, f'Duplicate client_id {client_id!r}')
+            client_ids.add(client_id)
+
+    items, lists = _load_references(user_id, ops)
+    created = {}  # client_id -> TodoItem created earlier in this batch
+    deleted_ids = set()  # items deleted earlier in the batch, descendants included
+    results = []
+
+    def resolve_item(index, ref):
+        item = created.get(ref) if isinstance(ref, str) else items.get(ref)
+        if item is None:
+            raise BatchError(index, f'Item {ref} not found', 404)
+        # By id: the attributes of a deleted item may be expired and cannot be reloaded
+        if item.id in deleted_ids:
+            raise BatchError(index, f'Item {ref} was deleted earlier in this batch', 404)
+        return item
+
+    def resolve_list(index, list_id):
+        todo_list = lists.get(list_id)
+        if todo_list is None:
+            raise BatchError(index, f'List {list_id} not found', 404)
+        return todo_list
+
+    for index, op in enumerate(ops):
+        kind = op.get('op')
+        try:
+            if kind == 'create':
+                todo_list = resolve_list(index, op.get('list_id'))
+                if not op.get('description'):
+                    raise BatchError(index, 'Description is required')
+                parent = None
+                if op.get('parent_id') is not None:
+                    parent = resolve_item(index, op['parent_id'])
+                item = operations.create_item(todo_list, op['description'], parent)
+                if op.get('client_id') is not None:
+                    created[op['client_id']] = item
+                results.append({
+                    'op': kind,
+                    'id': item.id,
+                    'client_id': op.get('client_id'),
+                    'description': item.description,
+                    'complete': item.complete,
+                    'parent_id': item.parent_id,
+                    'list_id': item.list_id
+                })
+            elif kind == 'toggle':
+                item = operations.toggle_item(resolve_item(index, op.get('item_id')))
+                results.append({'op': kind, 'id': item.id, 'complete': item.complete})
+            elif kind == 'edit':
+                if 'description' not in op:
+                    raise BatchError(index, 'Description is required')
+                item = operations.edit_item(resolve_item(index, op.get('item_id')), op['description'])
+                results.append({'op': kind, 'id': item.id, 'description': item.description})
+            elif kind == 'move':
+                item = resolve_item(index, op.get('item_id'))
+                parent = None
+                if op.get('parent_id') is not None:
+                    parent = resolve_item(index, op['parent_id'])
+                # Without a target list the item moves into its new parent's list
+                target_list = resolve_list(
+                    index, op['target_list_id'] if op.get('target_list_id') is not None
+                    else parent.list_id if parent is not None else None
+                )
+                operations.move_item(item, target_list, parent)
+                results.append({'op': kind, 'id': item.id, 'list_id': item.list_id,
+                                'parent_id': item.parent_id})
+            elif kind == 'reorder':
+                item = resolve_item(index, op.get('item_id'))
+                after = None
+                if op.get('after_id') is not None:
+                    after = resolve_item(index, op['after_id'])
+                operations.reorder_item(item, after)
+                results.append({'op': kind, 'id': item.id, 'position': item.position})
+            elif kind == 'delete':
+                item = resolve_item(index, op.get('item_id'))
+                # Flush pending edits first so the bulk DELETE sees them
+                db.session.flush()
+                deleted = operations.delete_item(item)
+                deleted_ids.update(deleted)
+                results.append({'op': kind, 'id': item.id, 'deleted_items': len(deleted)})
+            elif kind == 'rename_list':
+                if 'name' not in op:
+                    raise BatchError(index, 'List name is required')
+                todo_list = operations.rename_list(resolve_list(index, op.get('list_id')), op['name'])
+                results.append({'op': kind, 'id': todo_list.id, 'name': todo_list.name})
+            else:
+                raise BatchError(index, f"Unknown operation '{kind}'")
+        except BatchError:
+            raise
+        except OperationError as e:
+            raise BatchError(index, e.message, e.status)
+
+    return results
+
+
+def _is_id(value):
+    # JSON true/false would otherwise pass for the ids 1 and 0
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _load_references(user_id, ops):
+    item_ids = set()
+    list_ids = set()
+    for op in ops:
+        for key in _ITEM_KEYS:
+            # String ids are client ids of items created within the batch
+            if isinstance(op.get(key), int):
+                item_ids.add(op[key])
+        for key in _LIST_KEYS:
+            if op.get(key) is not None:
+                list_ids.add(op[key])
+
+    items = {}
+    if item_ids:
+        items = {item.id: item for item in TodoItem.query.filter(TodoItem.id.in_(item_ids))}
+        list_ids.update(item.list_id for item in items.values())
+
+    lists = {}
+    if list_ids:
+        lists = {lst.id: lst for lst in TodoList.query.filter(TodoList.id.in_(list_ids))}
+
+    # Ownership is checked once per referenced list
+    for todo_list in lists.values():
+        if todo_list.user_id != user_id:
+            raise BatchError(_first_reference(ops, items, todo_list.id), 'Unauthorized', 403)
+
+    # Items whose list is gone cannot be authorized, so treat them as missing
+    items = {item_id: item for item_id, item in items.items() if item.list_id in lists}
+    return items, lists
+
+
+def _first_reference(ops, items, list_id):
+    for index, op in enumerate(ops):
+        if list_id in (op.get('list_id'), op.get('target_list_id')):
+            return index
+        for key in _ITEM_KEYS:
+            item = items.get(op.get(key)) if isinstance(op.get(key), int) else None
+            if item is not None and item.list_id == list_id:
+                return index
+    return None
@@ -0,0 +1,228 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from flask_login import UserMixin
+
+
+class LocalCacheBackend:
+    """In-process LRU store of bytes values, bounded by their total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions
+            }
+
+
+class RedisCacheBackend:
+    """Shared store for several worker processes, through the ``redis`` package.
+
+    Size bounds and eviction are left to the server's ``maxmemory`` policy.
+    """
+
+    def __init__(self, url, prefix='todo:', ttl=3600):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                'LIST_CACHE_BACKEND=redis requires the redis package (pip install -r requirements.txt)'
+            ) from e
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._ttl = ttl
+
+    def get(self, key):
+        return self._client.get(self._prefix + key)
+
+    def set(self, key, value):
+        self._client.set(self._prefix + key, value, ex=self._ttl)
+
+    def delete(self, key):
+        self._client.delete(self._prefix + key)
+
+    def stats(self):
+        # Figures of the whole server, which every worker process shares
+        info = self._client.info()
+        return {
+            'entries': self._client.dbsize(),
+            'bytes': info['used_memory'],
+            'max_bytes': info['maxmemory'],
+            'evictions': info['evicted_keys'],
+            'server_hits': info['keyspace_hits'],
+            'server_misses': info['keyspace_misses']
+        }
+
+
+class ListCache:
+    """Encoded JSON bodies of the list read endpoints, keyed by user and view.
+
+    Entries are stamped with the user's data version, so an entry written
+    before a change is never served after it, even by another process.
+    Committed writes also drop the user's entries right away (see
+    ``sync``) so they do not linger until evicted.
+    """
+
+    VIEWS = ('lists', 'dashboard', 'summary')
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id, view, version):
+        value = self.backend.get(self._key(user_id, view))
+        if value is not None:
+            stamp, _, body = value.partition(b':')
+            if int(stamp) == version:
+                self.hits += 1
+                return body
+        self.misses += 1
+        return None
+
+    def set(self, user_id, view, version, body):
+        self.backend.set(self._key(user_id, view), b'%d:%s' % (version, body))
+
+    def invalidate(self, user_id):
+        self.invalidations += 1
+        for view in self.VIEWS:
+            self.backend.delete(self._key(user_id, view))
+
+    def stats(self):
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+    @staticmethod
+    def _key(user_id, view):
+        return f'{view}:{user_id}'
+
+
+class CachedUser(UserMixin):
+    """The part of a User that request handling needs, detached from any session."""
+
+    __slots__ = ('id', 'username')
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+
+class IdentityCache:
+    """TTL + LRU cache of ``CachedUser`` records in front of ``load_user``."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # user id -> (expires_at, CachedUser)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(user_id, None)
+            self.misses += 1
+            return None
+
+    def set(self, user):
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl
+            }
+
+
+def init_list_cache(app):
+    max_bytes = app.config['LIST_CACHE_MAX_BYTES']
+    if not max_bytes:
+        return
+    if app.config['LIST_CACHE_BACKEND'] == 'redis':
+        backend = RedisCacheBackend(app.config['LIST_CACHE_REDIS_URL'])
+    else:
+        backend = LocalCacheBackend(max_bytes)
+    app.extensions['list_cache'] = ListCache(backend)
+
+
+def list_cache():
+    return current_app.extensions.get('list_cache')
+
+
+def invalidate_lists(user_ids):
+    cache = list_cache()
+    if cache is not None:
+        for user_id in user_ids:
+            cache.invalidate(user_id)
+
+
+def init_identity_cache(app):
+    if app.config['IDENTITY_CACHE_SIZE']:
+        app.extensions['identity_cache'] = IdentityCache(
+            app.config['IDENTITY_CACHE_SIZE'], app.config['IDENTITY_CACHE_TTL']
+        )
+
+
+def identity_cache():
+    return current_app.extensions.get('identity_cache')
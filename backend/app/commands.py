@@ -0,0 +1,113 @@
+import sys
+
+import click
+
+from . import db
+
+
+def register_commands(app):
+    """Attach the maintenance commands to ``flask``, e.g. ``flask --app run compact-changes``."""
+
+    @app.cli.command('compact-changes')
+    def compact_changes_command():
+        """Drop change log entries older than CHANGE_LOG_RETENTION (run from cron)."""
+        from .sync import compact_changes
+        removed = compact_changes(app.config['CHANGE_LOG_RETENTION'])
+        db.session.commit()
+        click.echo(f'Removed {removed} change log entries')
+
+    @app.cli.command('db-upgrade')
+    def db_upgrade_command():
+        """Apply pending schema migrations."""
+        from .migrations import upgrade
+        applied = upgrade()
+        click.echo(f'Applied migrations {applied}' if applied else 'Schema is up to date')
+
+    @app.cli.command('db-status')
+    def db_status_command():
+        """Show the applied and the latest schema revision."""
+        from .migrations import current_revision, head_revision
+        with db.engine.connect() as conn:
+            click.echo(f'Current revision {current_revision(conn)}, latest {head_revision()}')
+
+    @app.cli.command('db-check-plans')
+    def db_check_plans_command():
+        """Fail unless the hot-path queries use their indexes (EXPLAIN QUERY PLAN)."""
+        from .migrations import check_query_plans
+        with db.engine.connect() as conn:
+            results = check_query_plans(conn)
+        for label, ok, plan in results:
+            click.echo(f"{'ok  ' if ok else 'FAIL'} {label}: {plan}")
+        if not all(ok for _, ok, _ in results):
+            sys.exit(1)
+
+    @app.cli.command('search-rebuild')
+    def search_rebuild_command():
+        """Re-index all list names and item descriptions for /api/search."""
+        from .search import rebuild_search_index
+        rebuild_search_index()
+        db.session.commit()
+        click.echo('Search index rebuilt')
+
+    @app.cli.command('rebalance-positions')
+    @click.option('--min-length', type=int, default=None,
+                  help='Rebalance groups with keys longer than this (default: half of POSITION_KEY_MAX_LENGTH).')
+    def rebalance_positions_command(min_length):
+        """Give sibling groups whose ordering keys grew long fresh, short keys (run from cron)."""
+        from .operations import rebalance_long_positions
+        if min_length is None:
+            min_length = app.config['POSITION_KEY_MAX_LENGTH'] // 2
+        groups = rebalance_long_positions(min_length)
+        db.session.commit()
+        click.echo(f'Rebalanced {groups} sibling groups')
+
+    @app.cli.command('check-counters')
+    @click.option('--repair', is_flag=True, help='Recompute the counters that are wrong.')
+    def check_counters_command(repair):
+        """Compare list and item completion counters with the rows they count."""
+        from .tree import check_counters
+        lists, items = check_counters(repair=repair)
+        if repair:
+            db.session.commit()
+            click.echo(f'Repaired the counters of {lists} lists and {items} items')
+        else:
+            click.echo(f'{lists} lists and {items} items have wrong counters')
+            if lists or items:
+                sys.exit(1)
+
+    @app.cli.command('export-lists')
+    @click.argument('username')
+    @click.argument('output', type=click.File('wb'), default='-')
+    def export_lists_command(username, output):
+        """Write USERNAME's lists and items as NDJSON to OUTPUT (default stdout)."""
+        from .transfer import iter_export
+        for chunk in iter_export(_user_id(username)):
+            output.write(chunk)
+
+    @app.cli.command('import-lists')
+    @click.argument('username')
+    @click.argument('source', type=click.File('rb'), default='-')
+    def import_lists_command(username, source):
+        """Add the lists and items of an NDJSON export to USERNAME's account."""
+        from .transfer import import_ndjson, ImportFailed
+        try:
+            result = import_ndjson(
+                _user_id(username), source,
+                max_depth=app.config['MAX_ITEM_DEPTH'],
+                chunk_size=app.config['IMPORT_CHUNK_SIZE']
+            )
+        except ImportFailed as e:
+            click.echo(f'{e.message} (imported {e.lists} lists and {e.items} items before it)', err=True)
+            sys.exit(1)
+        click.echo(
+            f"Imported {result['lists']} lists and {result['items']} items "
+            f"in {result['seconds']}s ({result['rows_per_second']} rows/s)", err=True
+        )
+
+
+def _user_id(username):
+    from .models import User
+    user_id = db.session.query(User.id).filter(User.username == username).scalar()
+    if user_id is None:
+        raise click.ClickException(f'No user named {username}')
+    return user_id
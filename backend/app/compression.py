@@ -0,0 +1,75 @@
+"""Compression of large responses for clients that accept it.
+
+Bodies of at least ``COMPRESSION_MIN_BYTES`` are compressed with brotli
+when the optional ``brotli`` package is installed and the client prefers
+it, with gzip otherwise. Streamed responses, whose size is not known up
+front, are always compressed, one chunk at a time with a flush after each
+so clients still receive them incrementally.
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/html')
+
+
+def init_compression(app):
+    min_bytes = app.config['COMPRESSION_MIN_BYTES']
+    if not min_bytes:
+        return
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        # The body now depends on Accept-Encoding, whether or not this one gets compressed
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(encodings)
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        elif response.content_length is not None and response.content_length >= min_bytes:
+            response.set_data(_compress(response.get_data(), encoding))
+        else:
+            return response
+        response.headers['Content-Encoding'] = encoding
+        # Same representation, different bytes: a strong ETag would claim byte equality
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return zlib.compress(body, GZIP_LEVEL, wbits=31)  # 31: gzip header and trailer
+
+
+def _compress_stream(chunks, encoding):
+    try:
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            for chunk in chunks:
+                yield compressor.process(chunk) + compressor.flush()
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            for chunk in chunks:
+                yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield compressor.flush()
+    finally:
+        # Lets stream_with_context release its request context when the client goes away
+        if hasattr(chunks, 'close'):
+            chunks.close()
@@ -0,0 +1,61 @@
+"""Cross-origin access for the React frontend.
+
+Preflight requests (OPTIONS with ``Access-Control-Request-Method``) are
+answered by ``PreflightMiddleware`` in front of the Flask app, so they
+never open a session, load the user or touch the database, and they carry
+an ``Access-Control-Max-Age`` that lets browsers skip the preflight of
+later requests. flask_cors adds the CORS headers of the actual responses.
+Both take their settings from ``CORS_*`` in the config.
+"""
+from flask_cors import CORS
+
+
+class PreflightMiddleware:
+    """WSGI middleware answering CORS preflights without calling the wrapped app."""
+
+    def __init__(self, wsgi_app, origins, methods, allow_headers, max_age):
+        self.wsgi_app = wsgi_app
+        self.origins = frozenset(origins)
+        # The same for every allowed origin, so built once
+        self.allowed = [
+            ('Access-Control-Allow-Methods', ', '.join(methods)),
+            ('Access-Control-Allow-Headers', ', '.join(allow_headers)),
+            ('Access-Control-Allow-Credentials', 'true'),
+            ('Access-Control-Max-Age', str(max_age)),
+        ]
+
+    def __call__(self, environ, start_response):
+        if (environ['REQUEST_METHOD'] != 'OPTIONS'
+                or 'HTTP_ACCESS_CONTROL_REQUEST_METHOD' not in environ):
+            return self.wsgi_app(environ, start_response)
+
+        headers = [('Vary', 'Origin'), ('Content-Length', '0')]
+        origin = environ.get('HTTP_ORIGIN')
+        # A disallowed origin gets no CORS headers, which makes the browser refuse the request
+        if origin in self.origins or '*' in self.origins:
+            headers.append(('Access-Control-Allow-Origin', origin))
+            headers.extend(self.allowed)
+        start_response('204 No Content', headers)
+        return [b'']
+
+
+def init_cors(app):
+    config = app.config
+    CORS(app,
+         resources={
+             r"/*": {
+                 "origins": config['CORS_ORIGINS'],
+                 "methods": config['CORS_METHODS'],
+                 "allow_headers": config['CORS_ALLOW_HEADERS'],
+                 "supports_credentials": True,
+                 "expose_headers": ["Set-Cookie"],
+                 "max_age": config['CORS_MAX_AGE']
+             }
+         })
+    app.wsgi_app = PreflightMiddleware(
+        app.wsgi_app,
+        origins=config['CORS_ORIGINS'],
+        methods=config['CORS_METHODS'],
+        allow_headers=config['CORS_ALLOW_HEADERS'],
+        max_age=config['CORS_MAX_AGE'],
+    )
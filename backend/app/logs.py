@@ -0,0 +1,118 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message and any fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Hands records to the writer thread and never blocks; drops them when the queue is full."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def restart_after_fork():
+    """Give a forked worker its own queue and writer thread; the parent's thread does not survive the fork."""
+    global _listener
+    if _listener is None:
+        return
+    log_queue = queue.Queue(maxsize=_listener.queue.maxsize)
+    for handler in logging.getLogger('app').handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            handler.queue = log_queue
+    _listener = QueueListener(log_queue, *_listener.handlers)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def log_event(logger, level, message, **fields):
+    """Log ``message`` with structured ``fields`` attached to the JSON record."""
+    logger.log(level, message, extra={'fields': fields})
+
+
+def sampled():
+    # Whether per-request debug and timing records are kept for this request
+    return g.get('log_sampled', True)
+
+
+def init_logging(app):
+    """Route the ``app`` loggers through a queue to a background writer thread.
+
+    Also installs the per-request hooks that decide sampling and log a
+    timing summary (route, status, duration, SQL statement count).
+    """
+    global _listener
+    logger = logging.getLogger('app')
+    logger.setLevel(app.config['LOG_LEVEL'])
+
+    if _listener is None:
+        log_queue = queue.Queue(maxsize=app.config['LOG_QUEUE_SIZE'])
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter())
+        _listener = QueueListener(log_queue, stream)
+        _listener.start()
+        atexit.register(_listener.stop)
+        logger.addHandler(DroppingQueueHandler(log_queue))
+        logger.propagate = False
+
+    sample_rates = app.config['LOG_SAMPLE_RATES']
+    default_rate = app.config['LOG_DEFAULT_SAMPLE_RATE']
+    request_log = logging.getLogger('app.request')
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.sql_count = 0
+        g.log_sampled = random.random() < sample_rates.get(request.endpoint, default_rate)
+
+    @app.after_request
+    def log_request_summary(response):
+        if sampled() and 'request_started' in g:
+            log_event(
+                request_log, logging.INFO, 'request',
+                method=request.method,
+                route=request.url_rule.rule if request.url_rule else request.path,
+                status=response.status_code,
+                duration_ms=round((time.perf_counter() - g.request_started) * 1000, 2),
+                sql_count=g.sql_count,
+            )
+        return response
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_count = g.get('sql_count', 0) + 1
@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .logs import log_event
+from .serialize import JSONProvider
+
+log = logging.getLogger(__name__)
+
+# Upper bounds of the latency buckets, in seconds
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label set, rendered in Prometheus text format."""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = _labels(self.labels, label_values)
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-2]}')
+                lines.append(f'{self.name}_sum{{{labels}}} {series[-1]:.6f}')
+                lines.append(f'{self.name}_count{{{labels}}} {series[-2]}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{{{_labels(self.labels, label_values)}}} {value}')
+        return lines
+
+
+class RequestMetrics:
+    """Per-route request histograms of this worker process.
+
+    Each worker keeps its own numbers; scrape every worker (or sum them)
+    when running more than one.
+    """
+
+    def __init__(self):
+        labels = ('method', 'route')
+        self.duration = Histogram(
+            'http_request_duration_seconds', 'Time spent handling the request.', labels, TIME_BUCKETS)
+        self.db_time = Histogram(
+            'http_request_db_seconds', 'Time spent executing SQL statements.', labels, TIME_BUCKETS)
+        self.serialize_time = Histogram(
+            'http_request_serialize_seconds', 'Time spent encoding JSON.', labels, TIME_BUCKETS)
+        self.statements = Histogram(
+            'http_request_sql_statements', 'SQL statements executed per request.', labels,
+            STATEMENT_BUCKETS)
+        self.responses = CounterMetric(
+            'http_responses_total', 'Responses by status code.', labels + ('status',))
+        self.n_plus_one = CounterMetric(
+            'http_n_plus_one_total', 'Requests that executed more SQL statements than allowed.',
+            labels)
+
+    def render(self):
+        lines = []
+        for metric in (self.duration, self.db_time, self.serialize_time, self.statements,
+                       self.responses, self.n_plus_one):
+            lines.extend(metric.render())
+        return lines
+
+
+class TimedJSONProvider(JSONProvider):
+    """Adds the time spent encoding JSON to the request's serialization total."""
+
+    def encode(self, obj):
+        if not has_request_context():
+            return super().encode(obj)
+        started = time.perf_counter()
+        try:
+            return super().encode(obj)
+        finally:
+            g.serialize_time = g.get('serialize_time', 0.0) + time.perf_counter() - started
+
+
+def init_metrics(app):
+    """Record per-request SQL, serialization and handler time.
+
+    Timings go out as a ``Server-Timing`` header and into the histograms
+    behind ``/metrics``. Requests running more than ``N_PLUS_ONE_THRESHOLD``
+    statements are counted and logged with their most repeated statement.
+    Relies on ``g.request_started`` and ``g.sql_count`` kept by ``logs``.
+    """
+    if not app.config['METRICS_ENABLED']:
+        return
+    metrics = app.extensions['metrics'] = RequestMetrics()
+    app.json = TimedJSONProvider(app)
+    threshold = app.config['N_PLUS_ONE_THRESHOLD']
+    server_timing = app.config['SERVER_TIMING']
+
+    @app.before_request
+    def start_request_metrics():
+        g.db_time = 0.0
+        g.serialize_time = 0.0
+        g.statements = Counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        if 'request_started' not in g:
+            return response
+        total = time.perf_counter() - g.request_started
+        db_time = g.get('db_time', 0.0)
+        serialize_time = g.get('serialize_time', 0.0)
+        handler_time = max(total - db_time - serialize_time, 0.0)
+        sql_count = g.get('sql_count', 0)
+
+        labels = (request.method, request.url_rule.rule if request.url_rule else '<unmatched>')
+        metrics.duration.observe(labels, total)
+        metrics.db_time.observe(labels, db_time)
+        metrics.serialize_time.observe(labels, serialize_time)
+        metrics.statements.observe(labels, sql_count)
+        metrics.responses.inc(labels + (str(response.status_code),))
+
+        if threshold and sql_count > threshold:
+            metrics.n_plus_one.inc(labels)
+            statement, repeats = g.statements.most_common(1)[0] if g.statements else ('', 0)
+            log_event(
+                log, logging.WARNING, 'possible N+1 query pattern',
+                method=labels[0], route=labels[1], sql_count=sql_count,
+                repeated_statement=statement[:200], repeats=repeats,
+            )
+
+        if server_timing:
+            response.headers['Server-Timing'] = ', '.join((
+                f'db;dur={db_time * 1000:.2f};desc="{sql_count} queries"',
+                f'serialize;dur={serialize_time * 1000:.2f}',
+                f'handler;dur={handler_time * 1000:.2f}',
+                f'total;dur={total * 1000:.2f}',
+            ))
+        return response
+
+
+def request_metrics():
+    return current_app.extensions.get('metrics')
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_statement(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    if has_request_context() and 'db_time' in g:
+        g.db_time += time.perf_counter() - started
+        g.statements[statement] += 1
+
+
+@event.listens_for(Engine, 'handle_error')
+def _failed_statement(context):
+    started = context.connection.info.get('query_started') if context.connection else None
+    if started:
+        started.pop()
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,354 @@
+"""Versioned, forward-only schema migrations.
+
+Applied revisions are recorded in the ``schema_migrations`` table. Each
+revision runs in its own transaction and is written so that it also
+succeeds on databases that ``db.create_all()`` built before migrations
+existed. New schema changes are appended to ``MIGRATIONS``; released
+revisions are never edited.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from . import db
+from .models import PATH_SEGMENT_WIDTH
+from .ordering import iter_keys
+
+log = logging.getLogger(__name__)
+
+
+def _baseline(conn):
+    # The schema as it was first shipped
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS user (
+            id INTEGER NOT NULL PRIMARY KEY,
+            username VARCHAR(80) NOT NULL UNIQUE,
+            password VARCHAR(200) NOT NULL
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS todo_list (
+            id INTEGER NOT NULL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES user (id)
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS todo_item (
+            id INTEGER NOT NULL PRIMARY KEY,
+            description VARCHAR(200) NOT NULL,
+            complete BOOLEAN,
+            parent_id INTEGER REFERENCES todo_item (id),
+            list_id INTEGER NOT NULL REFERENCES todo_list (id)
+        )
+    """))
+
+
+def _item_hierarchy(conn):
+    _add_column(conn, 'todo_item', 'depth', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(conn, 'todo_item', 'path', "VARCHAR(255) NOT NULL DEFAULT ''")
+
+    # Backfill depth and path for rows written before the columns existed
+    parents = dict(conn.execute(text("SELECT id, parent_id FROM todo_item WHERE path = ''")).all())
+    if parents:
+        known = {
+            item_id: (depth, path)
+            for item_id, depth, path in conn.execute(
+                text("SELECT id, depth, path FROM todo_item WHERE path != ''")
+            )
+        }
+
+        def place(item_id):
+            if item_id not in known:
+                parent_id = parents.get(item_id)
+                segment = f'{item_id:0{PATH_SEGMENT_WIDTH}d}/'
+                if parent_id is None or (parent_id not in parents and parent_id not in known):
+                    known[item_id] = (0, segment)
+                else:
+                    depth, path = place(parent_id)
+                    known[item_id] = (depth + 1, path + segment)
+            return known[item_id]
+
+        rows = []
+        for item_id in parents:
+            depth, path = place(item_id)
+            rows.append({'id': item_id, 'depth': depth, 'path': path})
+        conn.execute(text('UPDATE todo_item SET depth = :depth, path = :path WHERE id = :id'), rows)
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_todo_item_path ON todo_item (path)'))
+
+
+def _user_data_version(conn):
+    _add_column(conn, 'user', 'data_version', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(conn, 'user', 'changes_compacted_version', 'INTEGER NOT NULL DEFAULT 0')
+
+
+def _change_log(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            id INTEGER NOT NULL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES user (id),
+            version INTEGER NOT NULL,
+            entity VARCHAR(10) NOT NULL,
+            entity_id INTEGER NOT NULL,
+            action VARCHAR(10) NOT NULL,
+            created_at DATETIME NOT NULL
+        )
+    """))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_change_log_user_version ON change_log (user_id, version)'
+    ))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_change_log_created_at ON change_log (created_at)'))
+
+
+def _hot_path_indexes(conn):
+    # Per-user list fetches, per-list item fetches and children lookups
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_todo_list_user_id ON todo_list (user_id)'))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_todo_item_list_parent ON todo_item (list_id, parent_id)'
+    ))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_todo_item_parent_id ON todo_item (parent_id)'))
+
+
+def _search_index(conn):
+    # Items are stored under their id and lists under the negated id; owner
+    # holds a 'u<user id>' token so a user's matches are found through the
+    # index. Prefix indexes keep type-ahead queries of 2-6 characters cheap.
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "body, owner, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4 5 6')"
+    ))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS todo_item_search_insert AFTER INSERT ON todo_item BEGIN
+            INSERT INTO search_index (rowid, body, owner)
+            SELECT new.id, new.description, 'u' || user_id FROM todo_list WHERE id = new.list_id;
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS todo_item_search_update AFTER UPDATE OF description ON todo_item BEGIN
+            UPDATE search_index SET body = new.description WHERE rowid = new.id;
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS todo_item_search_delete AFTER DELETE ON todo_item BEGIN
+            DELETE FROM search_index WHERE rowid = old.id;
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS todo_list_search_insert AFTER INSERT ON todo_list BEGIN
+            INSERT INTO search_index (rowid, body, owner) VALUES (-new.id, new.name, 'u' || new.user_id);
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS todo_list_search_update AFTER UPDATE OF name ON todo_list BEGIN
+            UPDATE search_index SET body = new.name WHERE rowid = -new.id;
+        END
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER IF NOT EXISTS todo_list_search_delete AFTER DELETE ON todo_list BEGIN
+            DELETE FROM search_index WHERE rowid = -old.id;
+        END
+    """))
+    conn.execute(text('DELETE FROM search_index'))
+    conn.execute(text(
+        "INSERT INTO search_index (rowid, body, owner) "
+        "SELECT -id, name, 'u' || user_id FROM todo_list"
+    ))
+    conn.execute(text(
+        "INSERT INTO search_index (rowid, body, owner) "
+        "SELECT todo_item.id, todo_item.description, 'u' || todo_list.user_id "
+        "FROM todo_item JOIN todo_list ON todo_item.list_id = todo_list.id"
+    ))
+
+
+def _item_list_follows_root(conn):
+    # Items used to keep their old list when an ancestor was moved; every
+    # item now belongs to the list of its root
+    conn.execute(text("""
+        UPDATE todo_item SET list_id = (
+            SELECT root.list_id FROM todo_item AS root
+            WHERE root.path = substr(todo_item.path, 1, :width + 1)
+        )
+        WHERE depth > 0 AND EXISTS (
+            SELECT 1 FROM todo_item AS root
+            WHERE root.path = substr(todo_item.path, 1, :width + 1)
+              AND root.list_id != todo_item.list_id
+        )
+    """), {'width': PATH_SEGMENT_WIDTH})
+
+
+def _item_position(conn):
+    _add_column(conn, 'todo_item', 'position', "VARCHAR(64) NOT NULL DEFAULT ''")
+
+    # Existing items keep their id order within each sibling group
+    rows = []
+    group, keys = None, iter(())
+    for item_id, list_id, parent_id in conn.execute(text(
+        "SELECT id, list_id, parent_id FROM todo_item WHERE position = '' ORDER BY list_id, parent_id, id"
+    )):
+        if (list_id, parent_id) != group:
+            group, keys = (list_id, parent_id), iter_keys()
+        rows.append({'id': item_id, 'position': next(keys)})
+    if rows:
+        conn.execute(text('UPDATE todo_item SET position = :position WHERE id = :id'), rows)
+
+    # Sibling reads are ordered by position; the old (list_id, parent_id) index is its prefix
+    conn.execute(text('DROP INDEX IF EXISTS ix_todo_item_list_parent'))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_todo_item_siblings ON todo_item (list_id, parent_id, position)'
+    ))
+
+
+def _completion_counters(conn):
+    _add_column(conn, 'todo_list', 'item_count', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(conn, 'todo_list', 'completed_count', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(conn, 'todo_item', 'descendant_count', 'INTEGER NOT NULL DEFAULT 0')
+    _add_column(conn, 'todo_item', 'completed_descendant_count', 'INTEGER NOT NULL DEFAULT 0')
+
+    conn.execute(text("""
+        UPDATE todo_list SET
+            item_count = (SELECT count(*) FROM todo_item WHERE todo_item.list_id = todo_list.id),
+            completed_count = (
+                SELECT count(*) FROM todo_item
+                WHERE todo_item.list_id = todo_list.id AND todo_item.complete
+            )
+    """))
+    # Only items with children have anything to count
+    conn.execute(text("""
+        UPDATE todo_item SET
+            descendant_count = (
+                SELECT count(*) FROM todo_item AS below
+                WHERE below.path > todo_item.path AND below.path < todo_item.path || '~'
+            ),
+            completed_descendant_count = (
+                SELECT count(*) FROM todo_item AS below
+                WHERE below.path > todo_item.path AND below.path < todo_item.path || '~'
+                  AND below.complete
+            )
+        WHERE id IN (SELECT parent_id FROM todo_item WHERE parent_id IS NOT NULL)
+    """))
+
+
+def _item_updated_at(conn):
+    # SQLite cannot add a column with a non-constant default, so existing rows are stamped here
+    _add_column(conn, 'todo_item', 'updated_at', 'DATETIME')
+    # In the format SQLAlchemy writes, so that the strings compare in time order
+    conn.execute(text(
+        "UPDATE todo_item SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') || '000' "
+        "WHERE updated_at IS NULL"
+    ))
+
+
+MIGRATIONS = [
+    (1, 'baseline schema', _baseline),
+    (2, 'item depth and materialized path', _item_hierarchy),
+    (3, 'per-user data version', _user_data_version),
+    (4, 'change log', _change_log),
+    (5, 'hot path indexes', _hot_path_indexes),
+    (6, 'full-text search index', _search_index),
+    (7, 'item list follows root', _item_list_follows_root),
+    (8, 'item sibling position', _item_position),
+    (9, 'completion counters', _completion_counters),
+    (10, 'item update time', _item_updated_at),
+]
+
+
+def head_revision():
+    return MIGRATIONS[-1][0]
+
+
+def current_revision(conn):
+    if not inspect(conn).has_table('schema_migrations'):
+        return 0
+    return conn.execute(text('SELECT MAX(version) FROM schema_migrations')).scalar() or 0
+
+
+def ensure_schema(app):
+    """Startup check: a revision lookup, migrating only when behind and ``AUTO_MIGRATE`` is set.
+
+    Returns the revisions applied.
+    """
+    with db.engine.connect() as conn:
+        revision = current_revision(conn)
+    if revision >= head_revision():
+        return []
+    if not app.config['AUTO_MIGRATE']:
+        log.warning(f"Schema is at revision {revision}, head is {head_revision()}; run `flask db-upgrade`")
+        return []
+    return upgrade()
+
+
+def upgrade(engine=None):
+    """Apply every pending migration in order; returns the revisions applied."""
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER NOT NULL PRIMARY KEY,
+                name VARCHAR(200) NOT NULL,
+                applied_at DATETIME NOT NULL
+            )
+        """))
+        current = current_revision(conn)
+
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)'),
+                {'v': version, 'n': name, 't': datetime.utcnow()}
+            )
+        applied.append(version)
+    return applied
+
+
+# Representative statements behind the hot routes, with the index each must use
+HOT_PATH_QUERIES = {
+    'get_lists: lists of a user': (
+        'SELECT id, name FROM todo_list WHERE user_id = 1',
+        'ix_todo_list_user_id'
+    ),
+    'get_lists: items of the user\'s lists': (
+        'SELECT todo_item.id FROM todo_item JOIN todo_list ON todo_item.list_id = todo_list.id '
+        'WHERE todo_list.user_id = 1 AND todo_item.depth < 3',
+        'ix_todo_item_siblings'
+    ),
+    'new_item: parent depth lookup': (
+        'SELECT depth FROM todo_item WHERE id = 1',
+        'INTEGER PRIMARY KEY'
+    ),
+    'list items page: top-level items of a list': (
+        "SELECT id FROM todo_item WHERE list_id = 1 AND parent_id IS NULL AND position > 'a0' "
+        'ORDER BY position, id',
+        'ix_todo_item_siblings'
+    ),
+    'new_item: last sibling position': (
+        'SELECT max(position) FROM todo_item WHERE list_id = 1 AND parent_id = 1',
+        'ix_todo_item_siblings'
+    ),
+    'delete_item: subtree by path': (
+        "DELETE FROM todo_item WHERE path >= '0000000001/' AND path < '0000000001/~'",
+        'ix_todo_item_path'
+    ),
+    'delete_list: items of the list': (
+        'DELETE FROM todo_item WHERE list_id = 1',
+        'ix_todo_item_siblings'
+    ),
+}
+
+
+def check_query_plans(conn):
+    """Run EXPLAIN QUERY PLAN on ``HOT_PATH_QUERIES``; returns ``(label, ok, plan)`` tuples."""
+    results = []
+    for label, (statement, index) in HOT_PATH_QUERIES.items():
+        plan = ' | '.join(row[-1] for row in conn.execute(text('EXPLAIN QUERY PLAN ' + statement)))
+        results.append((label, index in plan, plan))
+    return results
+
+
+def _add_column(conn, table, column, definition):
+    if column not in {c['name'] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {definition}'))
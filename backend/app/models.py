@@ -1,16 +1,25 @@
 from . import db
+from sqlalchemy import and_
+from datetime import datetime
 from flask_login import UserMixin
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
+    # Bumped by every write to the user's lists or items; used as the ETag of list reads
+    data_version = db.Column(db.Integer, nullable=False, default=0)
+    # Change log entries up to this version have been compacted away
+    changes_compacted_version = db.Column(db.Integer, nullable=False, default=0)
     lists = db.relationship('TodoList', backref='owner', lazy=True)
 
 class TodoList(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    # Items of the list at any depth, and how many of them are complete
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
     
     # Update the relationship to cascade delete
     items = db.relationship('TodoItem', backref='list', 
@@ -21,17 +30,77 @@ class TodoList(db.Model):
         return f'<TodoList {self.name}>'
 
     def to_dict(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'items': [item.to_dict() for item in self.items]
-        }
+        from .tree import load_list_trees
+        trees = load_list_trees(self.user_id, list_ids=[self.id])
+        return trees[0] if trees else {'id': self.id, 'name': self.name, 'items': []}
+
+# Width of one zero-padded id segment in TodoItem.path
+PATH_SEGMENT_WIDTH = 10
 
 class TodoItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     description = db.Column(db.String(200), nullable=False)
     complete = db.Column(db.Boolean, default=False)
-    parent_id = db.Column(db.Integer, db.ForeignKey('todo_item.id'), nullable=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('todo_item.id'), nullable=True, index=True)
     list_id = db.Column(db.Integer, db.ForeignKey('todo_list.id'), nullable=False)
+    # Materialized hierarchy: depth is 0 for top-level items and path holds the
+    # zero-padded ids from the root down to the item itself, e.g.
+    # '0000000001/0000000007/'. A whole subtree is one range scan on path.
+    depth = db.Column(db.Integer, nullable=False, default=0)
+    path = db.Column(db.String(255), nullable=False, default='', index=True)
+    # Fractional ordering key among the items sharing list_id and parent_id
+    # (see ordering.py); moving an item between two siblings rewrites only its key
+    position = db.Column(db.String(64), nullable=False, default='')
+    # Items below this one at any depth, and how many of them are complete
+    descendant_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_descendant_count = db.Column(db.Integer, nullable=False, default=0)
+    # Set on every insert and update, including the bulk UPDATEs of moves and counters
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     # Self-referential relationship for sub-items (max depth will be enforced via logic)
-    children = db.relationship('TodoItem', backref=db.backref('parent', remote_side=[id]), lazy=True)
\ No newline at end of file
+    children = db.relationship('TodoItem', backref=db.backref('parent', remote_side=[id]), lazy=True,
+                               order_by='[TodoItem.position, TodoItem.id]')
+
+    __table_args__ = (db.Index('ix_todo_item_siblings', 'list_id', 'parent_id', 'position'),)
+
+    def place_under(self, parent):
+        """Set depth and path from ``parent`` (None for a top-level item).
+
+        The path ends with the item's own id, so the item must have been
+        flushed before calling this.
+        """
+        parent_path = parent.path if parent is not None else ''
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.path = parent_path + path_segment(self.id)
+
+    @property
+    def ancestor_path(self):
+        # The parent's path, '' for a top-level item
+        return self.path[:-(PATH_SEGMENT_WIDTH + 1)]
+
+    @staticmethod
+    def subtree_filter(path):
+        # '~' sorts after '/' and every digit, so this matches path and all of its extensions
+        return and_(TodoItem.path >= path, TodoItem.path < path + '~')
+
+    @staticmethod
+    def sibling_filter(list_id, parent_id):
+        parent = TodoItem.parent_id.is_(None) if parent_id is None else TodoItem.parent_id == parent_id
+        return and_(TodoItem.list_id == list_id, parent)
+
+
+def path_segment(item_id):
+    return f'{item_id:0{PATH_SEGMENT_WIDTH}d}/'
+
+
+class ChangeLog(db.Model):
+    """One created, updated or deleted list/item, written with the mutation itself."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # The user's data_version after the transaction that made the change
+    version = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(10), nullable=False)  # 'list' or 'item'
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # 'upsert' or 'delete'
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    __table_args__ = (db.Index('ix_change_log_user_version', 'user_id', 'version'),)
@@ -0,0 +1,167 @@
+from flask import current_app
+from sqlalchemy import func, select
+
+from . import db
+from .models import TodoList, TodoItem
+from .ordering import key_between
+from .tree import (
+    delete_subtree, delete_list_tree, move_subtree, subtree_height,
+    list_tree_item_ids, last_position, next_position, rebalance_siblings, adjust_counters,
+)
+from .sync import record_change, record_changes
+
+
+class OperationError(Exception):
+    """A mutation that cannot be applied; carries the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+# The helpers below stage changes in the current session without committing,
+# so a route can apply one of them or the batch endpoint can apply many
+# inside a single transaction. Each one bumps the owner's data version and
+# writes the change log in that same transaction.
+
+def create_list(user_id, name):
+    todo_list = TodoList(name=name, user_id=user_id)
+    db.session.add(todo_list)
+    db.session.flush()
+    record_change(user_id, 'list', todo_list.id)
+    return todo_list
+
+
+def rename_list(todo_list, name):
+    todo_list.name = name
+    record_change(todo_list.user_id, 'list', todo_list.id)
+    return todo_list
+
+
+def delete_list(todo_list):
+    record_changes(todo_list.user_id, 'item', list_tree_item_ids(todo_list.id), 'delete')
+    record_change(todo_list.user_id, 'list', todo_list.id, 'delete')
+    return delete_list_tree(todo_list.id)
+
+
+def create_item(todo_list, description, parent=None):
+    if parent is not None:
+        if parent.list_id != todo_list.id:
+            raise OperationError('The parent item must belong to the same list')
+        # Check hierarchy depth
+        max_depth = current_app.config['MAX_ITEM_DEPTH']
+        if parent.depth + 1 >= max_depth:
+            raise OperationError(f'Maximum hierarchy depth ({max_depth}) exceeded')
+
+    parent_id = parent.id if parent is not None else None
+    item = TodoItem(
+        description=description,
+        list_id=todo_list.id,
+        parent_id=parent_id,
+        position=key_between(last_position(todo_list.id, parent_id), None),
+        complete=False
+    )
+    db.session.add(item)
+    db.session.flush()
+    item.place_under(parent)
+    adjust_counters(todo_list.id, item.ancestor_path, 1, 0)
+    record_change(todo_list.user_id, 'item', item.id)
+    return item
+
+
+def toggle_item(item):
+    item.complete = not item.complete
+    adjust_counters(item.list_id, item.ancestor_path, 0, 1 if item.complete else -1)
+    record_change(item.list.user_id, 'item', item.id)
+    return item
+
+
+def edit_item(item, description):
+    item.description = description
+    record_change(item.list.user_id, 'item', item.id)
+    return item
+
+
+def move_item(item, target_list, parent=None):
+    """Move ``item`` and its subtree into ``target_list``, under ``parent`` or to the top level.
+
+    The caller has checked that the user owns the item, the target list and
+    the parent. Descendants follow in one set-based UPDATE.
+    """
+    if parent is not None:
+        if parent.list_id != target_list.id:
+            raise OperationError('The new parent must belong to the target list')
+        if parent.path.startswith(item.path):
+            raise OperationError('An item cannot be moved under itself or one of its sub-items')
+    max_depth = current_app.config['MAX_ITEM_DEPTH']
+    new_depth = parent.depth + 1 if parent is not None else 0
+    if new_depth + subtree_height(item.path) >= max_depth:
+        raise OperationError(f'Maximum hierarchy depth ({max_depth}) exceeded')
+
+    # Counters leave the old ancestors and list and join the new ones
+    items, completed = _subtree_counts(item)
+    adjust_counters(item.list_id, item.ancestor_path, -items, -completed)
+    adjust_counters(target_list.id, parent.path if parent is not None else '', items, completed)
+
+    # The item goes after the last of its new siblings
+    parent_id = parent.id if parent is not None else None
+    position = key_between(last_position(target_list.id, parent_id), None)
+    moved_ids = move_subtree(item, target_list.id, parent, position)
+    record_changes(target_list.user_id, 'item', moved_ids, 'upsert')
+    return item
+
+
+def reorder_item(item, after=None):
+    """Place ``item`` right after its sibling ``after``, or first among its siblings.
+
+    Only the item's own position changes, unless the new key grows past
+    ``POSITION_KEY_MAX_LENGTH`` and the sibling group is rebalanced first.
+    """
+    if after is not None:
+        if (after.list_id, after.parent_id) != (item.list_id, item.parent_id):
+            raise OperationError('Items can only be reordered among their siblings')
+        if after.id == item.id:
+            return item
+    user_id = item.list.user_id
+    for attempt in range(2):
+        lower = after.position if after is not None else None
+        position = key_between(lower, next_position(item, lower))
+        if attempt or len(position) <= current_app.config['POSITION_KEY_MAX_LENGTH']:
+            break
+        record_changes(user_id, 'item', rebalance_siblings(item.list_id, item.parent_id), 'upsert')
+    item.position = position
+    record_change(user_id, 'item', item.id)
+    return item
+
+
+def rebalance_long_positions(min_length):
+    """Rebalance every sibling group holding a key longer than ``min_length``.
+
+    Returns the number of groups rebalanced. Meant to run in the background
+    so that reorders rarely have to rebalance inline.
+    """
+    groups = db.session.execute(
+        select(TodoItem.list_id, TodoItem.parent_id, TodoList.user_id)
+        .join(TodoList, TodoItem.list_id == TodoList.id)
+        .where(func.length(TodoItem.position) > min_length)
+        .distinct()
+    ).all()
+    for list_id, parent_id, user_id in groups:
+        record_changes(user_id, 'item', rebalance_siblings(list_id, parent_id), 'upsert')
+    return len(groups)
+
+
+def delete_item(item):
+    """Delete ``item`` and its subtree; returns the ids of the deleted items."""
+    items, completed = _subtree_counts(item)
+    adjust_counters(item.list_id, item.ancestor_path, -items, -completed)
+    deleted_ids = delete_subtree(item.path)
+    record_changes(item.list.user_id, 'item', deleted_ids, 'delete')
+    return deleted_ids
+
+
+def _subtree_counts(item):
+    # The item itself plus its descendants, as (items, completed)
+    return (item.descendant_count + 1,
+            item.completed_descendant_count + (1 if item.complete else 0))
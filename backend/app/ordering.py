@@ -0,0 +1,142 @@
+"""Fractional ordering keys for sibling items.
+
+A key is a base-62 string whose byte order is the display order, so an
+item is placed between two siblings by giving it a key that sorts between
+theirs and no other row is renumbered. Keys start with an integer part
+whose first character encodes its length ('a0', 'a1', ..., 'az', 'b00',
+...), which keeps appends short; inserting again and again at the same
+spot grows the fractional part instead, until the sibling group is
+rebalanced with fresh keys from ``iter_keys``.
+"""
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+SMALLEST_INTEGER = 'A' + DIGITS[0] * 26
+
+
+def key_between(before, after):
+    """Return a key sorting after ``before`` and before ``after``; either may be None."""
+    if before is not None:
+        _validate(before)
+    if after is not None:
+        _validate(after)
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f'{before!r} does not sort before {after!r}')
+
+    if before is None:
+        if after is None:
+            return 'a' + DIGITS[0]
+        integer = _integer_part(after)
+        fraction = after[len(integer):]
+        if integer == SMALLEST_INTEGER:
+            return integer + _midpoint('', fraction)
+        if integer < after:
+            return integer
+        lower = _decrement(integer)
+        if lower is None:
+            raise ValueError('Cannot create a key before the smallest key')
+        return lower
+
+    integer = _integer_part(before)
+    fraction = before[len(integer):]
+    if after is None:
+        higher = _increment(integer)
+        return integer + _midpoint(fraction, None) if higher is None else higher
+
+    after_integer = _integer_part(after)
+    if integer == after_integer:
+        return integer + _midpoint(fraction, after[len(after_integer):])
+    higher = _increment(integer)
+    if higher is None:
+        raise ValueError('Cannot create a key after the largest key')
+    if higher < after:
+        return higher
+    return integer + _midpoint(fraction, None)
+
+
+def iter_keys():
+    """Yield ascending keys, as short as appending one item after another makes them."""
+    key = None
+    while True:
+        key = key_between(key, None)
+        yield key
+
+
+def _midpoint(lower, upper):
+    # Digits strictly between the fractions lower and upper (None: 1.0)
+    if upper is not None:
+        common = 0
+        while (lower[common] if common < len(lower) else DIGITS[0]) == upper[common]:
+            common += 1
+        if common:
+            return upper[:common] + _midpoint(lower[common:], upper[common:])
+    lower_digit = DIGITS.index(lower[0]) if lower else 0
+    upper_digit = DIGITS.index(upper[0]) if upper is not None else len(DIGITS)
+    if upper_digit - lower_digit > 1:
+        return DIGITS[(lower_digit + upper_digit + 1) // 2]
+    if upper is not None and len(upper) > 1:
+        return upper[0]
+    return DIGITS[lower_digit] + _midpoint(lower[1:], None)
+
+
+def _integer_length(head):
+    if 'a' <= head <= 'z':
+        return ord(head) - ord('a') + 2
+    if 'A' <= head <= 'Z':
+        return ord('Z') - ord(head) + 2
+    raise ValueError(f'Invalid ordering key head {head!r}')
+
+
+def _integer_part(key):
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f'Invalid ordering key {key!r}')
+    return key[:length]
+
+
+def _validate(key):
+    if not key or key == SMALLEST_INTEGER:
+        raise ValueError(f'Invalid ordering key {key!r}')
+    if key[len(_integer_part(key)):].endswith(DIGITS[0]):
+        raise ValueError(f'Invalid ordering key {key!r}')
+    if any(char not in DIGITS for char in key):
+        raise ValueError(f'Invalid ordering key {key!r}')
+
+
+def _increment(integer):
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        value = DIGITS.index(digits[i]) + 1
+        if value < len(DIGITS):
+            digits[i] = DIGITS[value]
+            return head + ''.join(digits)
+        digits[i] = DIGITS[0]
+    # Every digit carried over: move to the next integer length
+    if head == 'Z':
+        return 'a' + DIGITS[0]
+    if head == 'z':
+        return None
+    head = chr(ord(head) + 1)
+    if head > 'a':
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + ''.join(digits)
+
+
+def _decrement(integer):
+    head, digits = integer[0], list(integer[1:])
+    for i in reversed(range(len(digits))):
+        value = DIGITS.index(digits[i]) - 1
+        if value >= 0:
+            digits[i] = DIGITS[value]
+            return head + ''.join(digits)
+        digits[i] = DIGITS[-1]
+    if head == 'a':
+        return 'Z' + DIGITS[-1]
+    if head == 'A':
+        return None
+    head = chr(ord(head) - 1)
+    if head < 'Z':
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + ''.join(digits)
@@ -0,0 +1,99 @@
+import os
+import threading
+from concurrent.futures import TimeoutError
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingUnavailable(Exception):
+    """The hashing pool is saturated or too slow; the client should retry later."""
+
+
+class PasswordHasher:
+    """Runs password hashing on a bounded pool of worker processes.
+
+    At most ``workers + queue_size`` hashes may be pending at once; callers
+    beyond that are turned away immediately instead of queueing, so a burst
+    of logins cannot tie up every request worker. With ``workers=0`` hashing
+    runs inline in the calling thread.
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(workers + queue_size) if workers else None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HashingUnavailable('Too many concurrent password operations')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingUnavailable('Password operation timed out')
+
+    def _get_executor(self):
+        # Created lazily and per process, so a pool never crosses a fork
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # Imported here: it pulls in multiprocessing, which only hashing needs
+                from concurrent.futures import ProcessPoolExecutor
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+
+def init_password_hasher(app, processes=1):
+    """Create the hashing pool of one of ``processes`` app processes on the host.
+
+    ``PASSWORD_POOL_WORKERS`` and ``PASSWORD_POOL_QUEUE`` are shared out
+    between those processes, each keeping at least one hashing worker.
+    """
+    config = app.config
+    workers = config['PASSWORD_POOL_WORKERS']
+    app.extensions['password_hasher'] = PasswordHasher(
+        max(1, workers // processes) if workers else 0,
+        -(-config['PASSWORD_POOL_QUEUE'] // processes),  # rounded up
+        config['PASSWORD_POOL_TIMEOUT']
+    )
+
+
+def _hasher():
+    return current_app.extensions['password_hasher']
+
+
+def hash_password(password):
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    return _hasher().run(generate_password_hash, password, method)
+
+
+def verify_password(password_hash, password):
+    """Return ``(matches, needs_rehash)`` for ``password`` against a stored hash.
+
+    ``needs_rehash`` is set when the hash was made with a different method
+    or cost than ``PASSWORD_HASH_METHOD`` currently asks for.
+    """
+    matches = _hasher().run(check_password_hash, password_hash, password)
+    method = password_hash.split('$', 1)[0]
+    return matches, matches and method != _full_method(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+@lru_cache(maxsize=None)
+def _full_method(method):
+    # werkzeug fills in default parameters for a short method such as 'scrypt'
+    # or 'pbkdf2:sha256'; the prefix of a probe hash is what stored hashes carry
+    return generate_password_hash('', method).split('$', 1)[0]
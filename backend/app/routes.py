@@ -6,20 +6,60 @@ from flask import (
     flash, 
     jsonify, 
     make_response,
-    session
+    session,
+    stream_with_context,
+    Response
 )
 from flask_login import login_user, logout_user, login_required, current_user
 from .models import User, TodoList, TodoItem
 from . import db, login_manager
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_cors import cross_origin
-from datetime import datetime, timedelta
+from .tree import (
+    load_list_trees, load_list_summaries, load_item_page, load_item_subtree, iter_list_trees_json,
+    LIST_FIELDS, ITEM_FIELDS, DEFAULT_FIELDS,
+)
+from . import operations
+from .batch import apply_batch, BatchError
+from .transfer import iter_export, import_ndjson, ImportFailed
+from .search import search
+from .sync import current_version, version_etag, changes_since
+from .cache import list_cache, identity_cache, CachedUser
+from .passwords import hash_password, verify_password, HashingUnavailable
+import logging
+from .logs import log_event, sampled, DroppingQueueHandler
+from .metrics import request_metrics
+from .migrations import current_revision, head_revision
+from sqlalchemy import Integer, event, func, literal
+from sqlalchemy.orm import aliased
+from datetime import datetime, timezone
 
 from flask import current_app as app
 
+log = logging.getLogger(__name__)
+
+def debug_enabled():
+    # Per-request debug records are subject to the route's sampling rate
+    return sampled() and log.isEnabledFor(logging.DEBUG)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    cache = identity_cache()
+    user = cache.get(user_id) if cache else None
+    if user is None:
+        row = db.session.query(User.id, User.username).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        user = CachedUser(row.id, row.username)
+        if cache:
+            cache.set(user)
+    return user
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def forget_cached_user(mapper, connection, user):
+    cache = identity_cache()
+    if cache:
+        cache.invalidate(user.id)
 
 @login_manager.unauthorized_handler
 def unauthorized():
@@ -28,20 +68,18 @@ def unauthorized():
         'message': 'Please log in to access this resource'
     }), 401
 
+def hashing_unavailable(error):
+    log_event(log, logging.WARNING, 'password hashing unavailable', reason=str(error))
+    response = jsonify({'error': 'Server busy, please try again shortly', 'code': 'HASHING_BUSY'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @app.route('/')
 def home():
     return jsonify({"message": "Welcome to the Todo List App!"})
 
-@app.route('/register', methods=['POST', 'OPTIONS'])
+@app.route('/register', methods=['POST'])
 def register():
-    if request.method == "OPTIONS":
-        response = make_response()
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Accept')
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 200
-
     try:
         data = request.get_json()
         if not data:
@@ -56,38 +94,30 @@ def register():
         # Check if user already exists
         existing_user = User.query.filter_by(username=username).first()
         if existing_user:
-            print(f"User {username} already exists")  # Debug print
+            log_event(log, logging.INFO, 'registration rejected: username taken', username=username)
             return jsonify({'error': 'Username already exists'}), 409  # Changed to 409 Conflict
 
         # Create new user
         new_user = User(
             username=username,
-            password=generate_password_hash(password)
+            password=hash_password(password)
         )
         db.session.add(new_user)
         db.session.commit()
-        print(f"Successfully created user {username}")  # Debug print
+        log_event(log, logging.INFO, 'user registered', username=username, user_id=new_user.id)
         
-        response = jsonify({'message': 'Registration successful'})
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 201
+        return jsonify({'message': 'Registration successful'}), 201
             
+    except HashingUnavailable as e:
+        db.session.rollback()
+        return hashing_unavailable(e)
     except Exception as e:
         db.session.rollback()
-        print(f"Registration error: {str(e)}")
+        log.exception('Registration error')
         return jsonify({'error': str(e)}), 500
 
-@app.route('/login', methods=['POST', 'OPTIONS'])
+@app.route('/login', methods=['POST'])
 def login():
-    if request.method == "OPTIONS":
-        response = make_response()
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Accept')
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 200
-
     try:
         data = request.get_json()
         if not data:
@@ -100,12 +130,19 @@ def login():
             return jsonify({'error': 'Username and password are required'}), 400
 
         user = User.query.filter_by(username=username).first()
-        print(f"Login attempt for user: {username}")
+        log_event(log, logging.INFO, 'login attempt', username=username)
         
         if not user:
             return jsonify({'error': 'User not found', 'code': 'USER_NOT_FOUND'}), 401
-        elif not check_password_hash(user.password, password):
+
+        matches, needs_rehash = verify_password(user.password, password)
+        if not matches:
             return jsonify({'error': 'Incorrect password', 'code': 'INVALID_PASSWORD'}), 401
+
+        # Upgrade hashes made with an older PASSWORD_HASH_METHOD
+        if needs_rehash:
+            user.password = hash_password(password)
+            db.session.commit()
             
         # If we get here, both username and password are correct
         login_user(user, remember=True)
@@ -119,13 +156,6 @@ def login():
                 'username': user.username
             }
         }))
-
-        # Set CORS headers
-        response.headers.update({
-            'Access-Control-Allow-Origin': 'http://localhost:3000',
-            'Access-Control-Allow-Credentials': 'true',
-            'Access-Control-Expose-Headers': 'Set-Cookie'
-        })
         
         # Explicitly set the session cookie
         if '_user_id' in session:
@@ -140,58 +170,114 @@ def login():
                 path='/'
             )
         
-        print(f"User authenticated: {current_user.is_authenticated}")
-        print(f"Session data: {dict(session)}")
-        print(f"Response headers: {dict(response.headers)}")
+        if debug_enabled():
+            log_event(log, logging.DEBUG, 'login succeeded',
+                      user_id=user.id,
+                      session_keys=sorted(session.keys()),
+                      response_headers=sorted(response.headers.keys()))
         
         return response
 
+    except HashingUnavailable as e:
+        db.session.rollback()
+        return hashing_unavailable(e)
     except Exception as e:
-        print(f"Login error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception('Login error')
         return jsonify({'error': 'Server error occurred'}), 500
 
 @app.route('/logout', methods=['POST'])
 def logout():
     try:
         logout_user()
-        response = jsonify({'message': 'Logged out successfully'})
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 200
+        return jsonify({'message': 'Logged out successfully'}), 200
     except Exception as e:
-        print(f"Logout error: {str(e)}")
+        log.exception('Logout error')
         return jsonify({'error': 'Logout failed'}), 500
 
+def with_etag(response, etag):
+    # Clients must revalidate, which costs one version lookup instead of a full reload
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def not_modified(etag):
+    return with_etag(make_response('', 304), etag)
+
+def cached_json(view, version, build_payload):
+    # Reuse the encoded body from the list cache while the user's version is unchanged
+    cache = list_cache()
+    body = cache.get(current_user.id, view, version) if cache else None
+    if body is None:
+        response = jsonify(build_payload())
+        if cache:
+            cache.set(current_user.id, view, version, response.get_data())
+        return response
+    return app.response_class(body, mimetype=app.json.mimetype)
+
+def list_read_options(default_depth):
+    """Parse the query parameters narrowing a list read into ``load_list_trees`` keyword arguments.
+
+    Always returns ``max_depth``; ``fields``, ``list_ids``, ``complete``
+    and ``updated_since`` only when given. Raises ValueError with a message
+    for the client.
+    """
+    args = request.args
+    max_depth = app.config['MAX_ITEM_DEPTH']
+    options = {'max_depth': min(default_depth, max_depth)}
+    if 'fields' in args:
+        fields = tuple(field for field in args['fields'].split(',') if field)
+        unknown = [field for field in fields if field not in LIST_FIELDS and field not in ITEM_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        options['fields'] = fields
+    if 'depth' in args:
+        depth = args.get('depth', type=int)
+        if depth is None or depth < 0:
+            raise ValueError('depth must be a non-negative integer')
+        options['max_depth'] = min(depth, max_depth)
+    if 'list_ids' in args:
+        try:
+            options['list_ids'] = [int(list_id) for list_id in args['list_ids'].split(',') if list_id]
+        except ValueError:
+            raise ValueError('list_ids must be comma-separated list ids')
+    if 'complete' in args:
+        if args['complete'] not in ('true', 'false'):
+            raise ValueError('complete must be true or false')
+        options['complete'] = args['complete'] == 'true'
+    if 'updated_since' in args:
+        try:
+            since = datetime.fromisoformat(args['updated_since'])
+        except ValueError:
+            raise ValueError('updated_since must be an ISO 8601 time')
+        # Update times are stored as naive UTC
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        options['updated_since'] = since
+    return options
+
 # Dashboard: show the user's todo lists
 @app.route('/dashboard')
 @login_required
 def dashboard():
     # Should return JSON instead of template
-    lists = TodoList.query.filter_by(user_id=current_user.id).all()
-    return jsonify({
-        'lists': [
-            {
-                'id': lst.id,
-                'name': lst.name,
-                'items': [
-                    {
-                        'id': item.id,
-                        'description': item.description,
-                        'complete': item.complete,
-                        'children': [
-                            {
-                                'id': child.id,
-                                'description': child.description,
-                                'complete': child.complete
-                            } for child in item.children
-                        ]
-                    } for item in lst.items if item.parent_id is None
-                ]
-            } for lst in lists
-        ]
-    })
+    version = current_version(current_user.id)
+    etag = version_etag(current_user.id, version)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    try:
+        options = list_read_options(default_depth=2)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Only the default view is cached; narrowed reads are cheap to build
+    default_view = options == {'max_depth': min(2, app.config['MAX_ITEM_DEPTH'])}
+    options.setdefault('fields', ('name', 'description', 'complete'))
+    build = lambda: {'lists': load_list_trees(current_user.id, **options)}
+    if default_view:
+        response = cached_json('dashboard', version, build)
+    else:
+        response = jsonify(build())
+    return with_etag(response, etag)
 
 @app.route('/list/new', methods=['POST'])
 @login_required
@@ -201,21 +287,12 @@ def new_list():
     if not name:
         return jsonify({'error': 'List name is required'}), 400
         
-    new_list = TodoList(name=name, user_id=current_user.id)
-    db.session.add(new_list)
+    new_list = operations.create_list(current_user.id, name)
     db.session.commit()
     return jsonify({'message': 'List created successfully', 'id': new_list.id}), 201
 
-@app.route('/list/<int:list_id>/edit', methods=['POST', 'OPTIONS'])
+@app.route('/list/<int:list_id>/edit', methods=['POST'])
 def edit_list(list_id):
-    if request.method == "OPTIONS":
-        response = make_response()
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Accept')
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 200
-        
     if not current_user.is_authenticated:
         return jsonify({'error': 'Authentication required'}), 401
         
@@ -230,7 +307,7 @@ def edit_list(list_id):
     if not data or 'name' not in data:
         return jsonify({'error': 'List name is required'}), 400
         
-    todo_list.name = data['name']
+    operations.rename_list(todo_list, data['name'])
     db.session.commit()
     
     return jsonify({
@@ -238,16 +315,8 @@ def edit_list(list_id):
         'name': todo_list.name
     }), 200
 
-@app.route('/list/<int:list_id>/delete', methods=['POST', 'OPTIONS'])
+@app.route('/list/<int:list_id>/delete', methods=['POST'])
 def delete_list(list_id):
-    if request.method == "OPTIONS":
-        response = make_response()
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Accept')
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 200
-        
     if not current_user.is_authenticated:
         return jsonify({'error': 'Authentication required'}), 401
         
@@ -259,39 +328,17 @@ def delete_list(list_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     try:
-        # First, get all top-level items in the list
-        top_level_items = TodoItem.query.filter_by(list_id=list_id, parent_id=None).all()
-        
-        # For each top-level item, recursively delete its children
-        for item in top_level_items:
-            def delete_children(parent_item):
-                for child in parent_item.children:
-                    delete_children(child)
-                    db.session.delete(child)
-            
-            delete_children(item)
-            db.session.delete(item)
-        
-        # Finally, delete the list itself
-        db.session.delete(todo_list)
+        deleted_items = operations.delete_list(todo_list)
         db.session.commit()
         
-        return jsonify({'message': 'List deleted successfully'}), 200
+        return jsonify({'message': 'List deleted successfully', 'deleted_items': deleted_items}), 200
     except Exception as e:
         db.session.rollback()
-        print(f"Error deleting list: {str(e)}")
+        log.exception('Error deleting list')
         return jsonify({'error': 'Failed to delete list'}), 500
 
-@app.route('/list/<int:list_id>/item/new', methods=['POST', 'OPTIONS'])
+@app.route('/list/<int:list_id>/item/new', methods=['POST'])
 def new_item(list_id):
-    if request.method == "OPTIONS":
-        response = make_response()
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Accept')
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 200
-        
     if not current_user.is_authenticated:
         return jsonify({'error': 'Authentication required'}), 401
         
@@ -306,26 +353,21 @@ def new_item(list_id):
     if not data or 'description' not in data:
         return jsonify({'error': 'Description is required'}), 400
         
-    new_item = TodoItem(
-        description=data['description'],
-        list_id=list_id,
-        parent_id=data.get('parent_id'),  # Optional parent_id for hierarchical structure
-        complete=False
-    )
-    
-    # Check hierarchy depth
+    parent = None
     if data.get('parent_id'):
-        depth = 1
-        parent = TodoItem.query.get(data['parent_id'])
-        
-        while parent and parent.parent_id:
-            depth += 1
-            parent = TodoItem.query.get(parent.parent_id)
-            
-        if depth > 2:  # Limit to 3 levels (0, 1, 2)
-            return jsonify({'error': 'Maximum hierarchy depth (3) exceeded'}), 400
-    
-    db.session.add(new_item)
+        # Another user's item is answered like a missing one
+        parent = (
+            TodoItem.query.join(TodoList, TodoItem.list_id == TodoList.id)
+            .filter(TodoItem.id == data['parent_id'], TodoList.user_id == current_user.id)
+            .first()
+        )
+        if not parent:
+            return jsonify({'error': 'Parent item not found'}), 404
+
+    try:
+        new_item = operations.create_item(todo_list, data['description'], parent)
+    except operations.OperationError as e:
+        return jsonify({'error': e.message}), e.status
     db.session.commit()
     
     return jsonify({
@@ -345,25 +387,13 @@ def toggle_item_complete(item_id):
         return jsonify({'error': 'Unauthorized'}), 403
     
     # Toggle the completion status of this specific item only
-    item.complete = not item.complete
+    operations.toggle_item(item)
     
     # Don't automatically update children's status
     db.session.commit()
     
     # Return the updated item with its children
-    def get_item_with_children(item):
-        result = {
-            'id': item.id,
-            'description': item.description,
-            'complete': item.complete,
-            'parent_id': item.parent_id,
-            'children': []
-        }
-        for child in item.children:
-            result['children'].append(get_item_with_children(child))
-        return result
-    
-    return jsonify(get_item_with_children(item)), 200
+    return jsonify(load_item_subtree(item.path)), 200
 
 @app.route('/item/<int:parent_id>/subitem/new', methods=['GET', 'POST'])
 @login_required
@@ -374,14 +404,10 @@ def new_subitem(parent_id):
         flash('Unauthorized access.', 'danger')
         return redirect(url_for('dashboard'))
     
-    # Check the hierarchy depth by traversing the parent chain
-    depth = 1
-    current = parent_item
-    while current.parent is not None:
-        depth += 1
-        current = current.parent
-    if depth >= 3:
-        flash('Maximum hierarchy depth reached (3 levels).', 'warning')
+    # Check the hierarchy depth
+    max_depth = app.config['MAX_ITEM_DEPTH']
+    if parent_item.depth + 1 >= max_depth:
+        flash(f'Maximum hierarchy depth reached ({max_depth} levels).', 'warning')
         return redirect(url_for('dashboard'))
 
     if request.method == 'POST':
@@ -389,23 +415,14 @@ def new_subitem(parent_id):
         if not description:
             flash('Description is required!', 'warning')
             return redirect(url_for('new_subitem', parent_id=parent_id))
-        new_subitem = TodoItem(description=description, list_id=parent_item.list_id, parent_id=parent_id)
-        db.session.add(new_subitem)
+        operations.create_item(parent_item.list, description, parent_item)
         db.session.commit()
         flash('New subtask added!', 'success')
         return redirect(url_for('dashboard'))
     return render_template('new_subitem.html', parent=parent_item)
 
-@app.route('/item/<int:item_id>/edit', methods=['POST', 'OPTIONS'])
+@app.route('/item/<int:item_id>/edit', methods=['POST'])
 def edit_item(item_id):
-    if request.method == "OPTIONS":
-        response = make_response()
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Accept')
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 200
-        
     if not current_user.is_authenticated:
         return jsonify({'error': 'Authentication required'}), 401
         
@@ -421,7 +438,7 @@ def edit_item(item_id):
     if not data or 'description' not in data:
         return jsonify({'error': 'Description is required'}), 400
     
-    item.description = data['description']
+    operations.edit_item(item, data['description'])
     db.session.commit()
     
     return jsonify({
@@ -431,9 +448,11 @@ def edit_item(item_id):
 
 @app.route('/check-session', methods=['GET'])
 def check_session():
-    print("Checking session for user:", current_user.is_authenticated)
-    print("Session data:", dict(session))
-    print("Request cookies:", request.cookies)
+    if debug_enabled():
+        log_event(log, logging.DEBUG, 'checking session',
+                  authenticated=current_user.is_authenticated,
+                  session_keys=sorted(session.keys()),
+                  cookies=sorted(request.cookies.keys()))
     
     if current_user.is_authenticated:
         return jsonify({
@@ -471,16 +490,60 @@ def debug():
         'headers': dict(request.headers)
     })
 
-@app.route('/debug-cookies', methods=['GET', 'OPTIONS'])
+@app.route('/debug-cache', methods=['GET'])
+def debug_cache():
+    cache = list_cache()
+    identities = identity_cache()
+    return jsonify({
+        'list_cache': cache.stats() if cache else None,
+        'identity_cache': identities.stats() if identities else None
+    })
+
+# Liveness: the worker is up and serving requests
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok'}), 200
+
+# Readiness: the database answers and its schema is current
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    try:
+        revision = current_revision(db.session.connection())
+    except Exception as e:
+        log_event(log, logging.WARNING, 'readiness check failed', error=str(e))
+        return jsonify({'status': 'unavailable', 'error': 'Database unavailable'}), 503
+    finally:
+        db.session.rollback()
+    if revision != head_revision():
+        return jsonify({'status': 'unavailable', 'error': 'Schema out of date',
+                        'revision': revision, 'head': head_revision()}), 503
+    return jsonify({'status': 'ok', 'revision': revision}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    registry = request_metrics()
+    if registry is None:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    lines = registry.render()
+    # Point-in-time values of the caches and background queues of this worker
+    gauges = {
+        'startup_seconds': round(app.extensions.get('startup_seconds', 0), 6),
+        'log_records_dropped': DroppingQueueHandler.dropped
+    }
+    for name, cache in (('list_cache', list_cache()), ('identity_cache', identity_cache())):
+        if cache:
+            for key, value in cache.stats().items():
+                gauges[f'{name}_{key}'] = value
+    hasher = app.extensions.get('password_hasher')
+    if hasher:
+        gauges['password_hash_rejected'] = hasher.rejected
+    for name, value in gauges.items():
+        lines.append(f'# TYPE todo_{name} gauge')
+        lines.append(f'todo_{name} {value}')
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug-cookies', methods=['GET'])
 def debug_cookies():
-    if request.method == "OPTIONS":
-        response = make_response()
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Accept')
-        response.headers.add('Access-Control-Allow-Methods', 'GET, OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 200
-        
     return jsonify({
         'cookies': dict(request.cookies),
         'headers': dict(request.headers),
@@ -505,11 +568,7 @@ def create_list():
     if not data or 'name' not in data:
         return jsonify({'error': 'List name is required'}), 400
         
-    new_list = TodoList(
-        name=data['name'],
-        user_id=current_user.id
-    )
-    db.session.add(new_list)
+    new_list = operations.create_list(current_user.id, data['name'])
     db.session.commit()
     
     return jsonify({
@@ -521,30 +580,134 @@ def create_list():
 @app.route('/api/lists', methods=['GET'])
 @login_required
 def get_lists():
-    lists = TodoList.query.filter_by(user_id=current_user.id).all()
+    version = current_version(current_user.id)
+    etag = version_etag(current_user.id, version)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    max_depth = app.config['MAX_ITEM_DEPTH']
+    try:
+        options = list_read_options(default_depth=max_depth)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if request.args.get('stream', type=int):
+        # Encode list by list and subtree by subtree instead of building one big document
+        chunks = iter_list_trees_json(current_user.id, dumps=app.json.encode, **options)
+        response = Response(stream_with_context(chunks), mimetype='application/json')
+        return with_etag(response, etag), 200
+
+    build = lambda: {'lists': load_list_trees(current_user.id, **options)}
+    if options == {'max_depth': max_depth}:
+        response = cached_json('lists', version, build)
+    else:
+        response = jsonify(build())
+    return with_etag(response, etag), 200
+
+# List names with item and completed counts, e.g. for a sidebar
+@app.route('/api/lists/summary', methods=['GET'])
+@login_required
+def get_list_summaries():
+    version = current_version(current_user.id)
+    etag = version_etag(current_user.id, version)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    response = cached_json('summary', version, lambda: {
+        'lists': load_list_summaries(current_user.id)
+    })
+    return with_etag(response, etag), 200
+
+# Get one page of a list's top-level items (with their subtrees)
+@app.route('/api/lists/<int:list_id>/items', methods=['GET'])
+@login_required
+def get_list_items(list_id):
+    todo_list = TodoList.query.filter_by(id=list_id, user_id=current_user.id).first()
+    if not todo_list:
+        return jsonify({'error': 'List not found'}), 404
+
+    limit = min(
+        request.args.get('limit', app.config['ITEMS_PAGE_SIZE'], type=int),
+        app.config['MAX_ITEMS_PAGE_SIZE']
+    )
+    if limit < 1:
+        return jsonify({'error': 'Limit must be positive'}), 400
+
+    try:
+        options = list_read_options(default_depth=app.config['MAX_ITEM_DEPTH'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Pages are cut on top-level items, so only fields and depth apply to them
+    try:
+        items, next_cursor = load_item_page(
+            list_id,
+            after=request.args.get('after'),
+            limit=limit,
+            max_depth=options['max_depth'],
+            fields=options.get('fields', DEFAULT_FIELDS)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify({
-        'lists': [{
-            'id': lst.id,
-            'name': lst.name,
-            'items': [{
-                'id': item.id,
-                'description': item.description,
-                'complete': item.complete,
-                'collapsed': False,  # This will be managed on the frontend
-                'children': [{
-                    'id': subitem.id,
-                    'description': subitem.description,
-                    'complete': subitem.complete,
-                    'children': [{
-                        'id': subsubitem.id,
-                        'description': subsubitem.description,
-                        'complete': subsubitem.complete
-                    } for subsubitem in subitem.children]
-                } for subitem in item.children]
-            } for item in lst.items if item.parent_id is None]  # Only get top-level items
-        } for lst in lists]
+        'id': todo_list.id,
+        'name': todo_list.name,
+        'items': items,
+        'next_cursor': next_cursor
     }), 200
 
+# Get the lists and items changed since a cursor returned by an earlier call
+@app.route('/api/changes', methods=['GET'])
+@login_required
+def get_changes():
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'error': 'An integer since cursor is required'}), 400
+    return jsonify(changes_since(current_user.id, since)), 200
+
+# Search the user's item descriptions and list names
+@app.route('/api/search', methods=['GET'])
+@login_required
+def search_items():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'A search query q is required'}), 400
+    limit = min(
+        request.args.get('limit', app.config['SEARCH_PAGE_SIZE'], type=int),
+        app.config['MAX_SEARCH_PAGE_SIZE']
+    )
+    offset = request.args.get('offset', 0, type=int)
+    if limit < 1 or offset < 0:
+        return jsonify({'error': 'Limit must be positive and offset not negative'}), 400
+
+    results, next_offset = search(current_user.id, query, limit=limit, offset=offset)
+    return jsonify({'results': results, 'next_offset': next_offset}), 200
+
+# Download all of the user's lists and items as NDJSON
+@app.route('/api/export', methods=['GET'])
+@login_required
+def export_lists():
+    chunks = iter_export(current_user.id, dumps=app.json.encode)
+    response = Response(stream_with_context(chunks), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename="todo-lists.ndjson"'
+    return response, 200
+
+# Create lists and items from an NDJSON upload in the export format
+@app.route('/api/import', methods=['POST'])
+@login_required
+def import_lists():
+    try:
+        result = import_ndjson(
+            current_user.id, request.stream,
+            max_depth=app.config['MAX_ITEM_DEPTH'],
+            chunk_size=app.config['IMPORT_CHUNK_SIZE']
+        )
+    except ImportFailed as e:
+        return jsonify({
+            'error': e.message, 'line': e.line,
+            'imported': {'lists': e.lists, 'items': e.items}
+        }), e.status
+    log_event(log, logging.INFO, 'lists imported', user_id=current_user.id, **result)
+    return jsonify(result), 201
+
 # Toggle item completion status
 @app.route('/api/items/<int:item_id>/toggle', methods=['POST'])
 @login_required
@@ -553,7 +716,7 @@ def toggle_item(item_id):
     if item.list.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
         
-    item.complete = not item.complete
+    operations.toggle_item(item)
     db.session.commit()
     
     return jsonify({
@@ -561,57 +724,88 @@ def toggle_item(item_id):
         'complete': item.complete
     }), 200
 
+# Place an item after one of its siblings (first when after_id is null)
+@app.route('/api/items/<int:item_id>/reorder', methods=['POST'])
+@login_required
+def reorder_item(item_id):
+    data = request.get_json(silent=True) or {}
+    after_id = data.get('after_id')
+    if after_id is not None and (not isinstance(after_id, int) or isinstance(after_id, bool)):
+        return jsonify({'error': 'after_id must be an item id or null'}), 400
+
+    # The item and its new predecessor come back with their owners in one query
+    rows = {
+        item.id: (item, user_id)
+        for item, user_id in db.session.query(TodoItem, TodoList.user_id)
+        .join(TodoList, TodoItem.list_id == TodoList.id)
+        .filter(TodoItem.id.in_({item_id, after_id} - {None}))
+    }
+    if item_id not in rows or (after_id is not None and after_id not in rows):
+        return jsonify({'error': 'Item not found'}), 404
+    if any(user_id != current_user.id for _, user_id in rows.values()):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    item = rows[item_id][0]
+    try:
+        operations.reorder_item(item, rows[after_id][0] if after_id is not None else None)
+    except operations.OperationError as e:
+        return jsonify({'error': e.message}), e.status
+    db.session.commit()
+
+    return jsonify({
+        'id': item.id,
+        'list_id': item.list_id,
+        'parent_id': item.parent_id,
+        'position': item.position
+    }), 200
+
 # Move item to different list
-@app.route('/item/<int:item_id>/move', methods=['POST', 'OPTIONS'])
+@app.route('/item/<int:item_id>/move', methods=['POST'])
 def move_item(item_id):
-    if request.method == "OPTIONS":
-        response = make_response()
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Accept')
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 200
-        
     if not current_user.is_authenticated:
         return jsonify({'error': 'Authentication required'}), 401
         
     data = request.get_json()
     target_list_id = data.get('target_list_id')
+    parent_id = data.get('parent_id')
     
-    if not target_list_id:
-        return jsonify({'error': 'Target list ID is required'}), 400
-        
-    item = TodoItem.query.get(item_id)
-    target_list = TodoList.query.get(target_list_id)
-    
-    if not item or not target_list:
+    if not target_list_id and parent_id is None:
+        return jsonify({'error': 'Target list ID or parent ID is required'}), 400
+        
+    # Item, its owner, the target list and the new parent in one query; without
+    # a target list id the item moves into the parent's list
+    source_list = aliased(TodoList)
+    parent_item = aliased(TodoItem)
+    row = (
+        db.session.query(TodoItem, source_list.user_id, TodoList, parent_item)
+        .select_from(TodoItem)
+        .join(source_list, TodoItem.list_id == source_list.id)
+        # A bound NULL rather than IS NULL, which would scan todo_item for the missing parent
+        .outerjoin(parent_item, parent_item.id == literal(parent_id, Integer))
+        .outerjoin(TodoList, TodoList.id == func.coalesce(target_list_id or None, parent_item.list_id))
+        .filter(TodoItem.id == item_id)
+        .first()
+    )
+    if row is None or row[2] is None or (parent_id is not None and row[3] is None):
         return jsonify({'error': 'Item or target list not found'}), 404
+    item, owner_id, target_list, parent = row
         
     # Ensure the user owns both the item and the target list
-    if item.list.user_id != current_user.id or target_list.user_id != current_user.id:
+    if owner_id != current_user.id or target_list.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
         
-    # Only allow moving top-level items (no parent)
-    if item.parent_id is not None:
-        return jsonify({'error': 'Only top-level items can be moved between lists'}), 400
-    
     # Move the item to the new list
-    item.list_id = target_list_id
+    try:
+        operations.move_item(item, target_list, parent)
+    except operations.OperationError as e:
+        return jsonify({'error': e.message}), e.status
     db.session.commit()
     
     return jsonify({'message': 'Item moved successfully'}), 200
 
 # Delete an item
-@app.route('/item/<int:item_id>/delete', methods=['POST', 'OPTIONS'])
+@app.route('/item/<int:item_id>/delete', methods=['POST'])
 def delete_item(item_id):
-    if request.method == "OPTIONS":
-        response = make_response()
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Accept')
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        return response, 200
-        
     if not current_user.is_authenticated:
         return jsonify({'error': 'Authentication required'}), 401
         
@@ -623,30 +817,50 @@ def delete_item(item_id):
     if item.list.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Delete the item and all its children recursively
-    def delete_item_recursive(item_to_delete):
-        for child in item_to_delete.children:
-            delete_item_recursive(child)
-        db.session.delete(item_to_delete)
-    
-    delete_item_recursive(item)
+    # Delete the item and all its children in one statement
+    deleted_items = len(operations.delete_item(item))
     db.session.commit()
     
-    return jsonify({'message': 'Item deleted successfully'}), 200
+    return jsonify({'message': 'Item deleted successfully', 'deleted_items': deleted_items}), 200
+
+# Apply many item/list operations in one request and one transaction
+@app.route('/api/batch', methods=['POST'])
+def batch():
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Authentication required'}), 401
+
+    data = request.get_json()
+    if not data or not isinstance(data.get('operations'), list):
+        return jsonify({'error': 'A list of operations is required'}), 400
+
+    max_operations = app.config['MAX_BATCH_OPERATIONS']
+    if len(data['operations']) > max_operations:
+        return jsonify({'error': f'At most {max_operations} operations per batch'}), 413
+
+    try:
+        results = apply_batch(current_user.id, data['operations'])
+    except BatchError as e:
+        db.session.rollback()
+        return jsonify({'error': e.message, 'index': e.index}), e.status
+
+    db.session.commit()
+    return jsonify({'results': results}), 200
 
 @app.before_request
 def before_request():
-    print(f"Request path: {request.path}")
-    print(f"Request cookies: {request.cookies}")
-    print(f"Current user authenticated: {current_user.is_authenticated}")
-    if current_user.is_authenticated:
-        print(f"Current user id: {current_user.id}")
+    if debug_enabled():
+        log_event(log, logging.DEBUG, 'request received',
+                  path=request.path,
+                  cookies=sorted(request.cookies.keys()),
+                  authenticated=current_user.is_authenticated,
+                  user_id=current_user.id if current_user.is_authenticated else None)
 
 @app.route('/api/lists/<int:list_id>', methods=['PUT'])
 @login_required
 def update_list(list_id):
     data = request.get_json()
-    print(f"Update list request data: {data}")
+    if debug_enabled():
+        log_event(log, logging.DEBUG, 'update list request', list_id=list_id, data=data)
     
     if not data:
         return jsonify({'error': 'Missing request data'}), 400
@@ -659,7 +873,7 @@ def update_list(list_id):
     if not todo_list:
         return jsonify({'error': 'List not found'}), 404
     
-    todo_list.name = data['name']
+    operations.rename_list(todo_list, data['name'])
     db.session.commit()
     
     # Return a simplified response without using to_dict()
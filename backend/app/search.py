@@ -0,0 +1,111 @@
+"""Full-text search over item descriptions and list names.
+
+Backed by the ``search_index`` FTS5 table, which triggers on ``todo_item``
+and ``todo_list`` keep current (see migration 6). Items are indexed under
+their id and lists under the negated id.
+"""
+import re
+
+from sqlalchemy import text
+
+from . import db
+from .storage import reader
+from .models import TodoList, TodoItem
+
+MAX_TERMS = 10
+
+
+def match_expression(user_id, query):
+    """FTS5 query matching every word of ``query``, the last one as a prefix, within the user's rows.
+
+    Returns None when ``query`` contains no searchable words.
+    """
+    terms = re.findall(r'\w+', query)[:MAX_TERMS]
+    if not terms:
+        return None
+    # \w+ tokens cannot contain quotes, so quoting them is enough to escape FTS5 syntax
+    phrases = ' '.join(f'"{term}"' for term in terms) + '*'
+    return f'owner : "u{user_id}" AND body : ({phrases})'
+
+
+def search(user_id, query, limit=20, offset=0):
+    """Return one page of the user's lists and items matching ``query``.
+
+    Results are ranked by bm25, ties broken by rowid, so that every page
+    of a query comes from the same ordering. Each item hit carries its
+    list and its ancestors, root first. Returns ``(results, next_offset)``,
+    where ``next_offset`` is None on the last page.
+    """
+    expression = match_expression(user_id, query)
+    if expression is None:
+        return [], None
+
+    session = reader()
+    hits = session.execute(
+        text(
+            'SELECT rowid FROM search_index WHERE search_index MATCH :match '
+            'ORDER BY rank, rowid LIMIT :limit OFFSET :offset'
+        ),
+        {'match': expression, 'limit': limit + 1, 'offset': offset}
+    ).scalars().all()
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+
+    item_ids = [rowid for rowid in hits if rowid > 0]
+    list_ids = {-rowid for rowid in hits if rowid < 0}
+
+    # The hits' paths name their ancestors, so hits and ancestors come back together
+    items = {}
+    if item_ids:
+        paths = session.query(TodoItem.path).filter(TodoItem.id.in_(item_ids)).all()
+        wanted = {
+            int(segment)
+            for (path,) in paths
+            for segment in path.rstrip('/').split('/')
+        }
+        for row in session.query(
+            TodoItem.id, TodoItem.description, TodoItem.complete, TodoItem.list_id, TodoItem.path
+        ).filter(TodoItem.id.in_(wanted)):
+            items[row.id] = row
+        list_ids.update(row.list_id for row in items.values() if row.id in item_ids)
+
+    lists = dict(
+        session.query(TodoList.id, TodoList.name).filter(TodoList.id.in_(list_ids)).all()
+    ) if list_ids else {}
+
+    results = []
+    for rowid in hits:
+        if rowid < 0:
+            results.append({'type': 'list', 'id': -rowid, 'name': lists.get(-rowid)})
+            continue
+        item = items.get(rowid)
+        if item is None:
+            continue
+        ancestor_ids = [int(segment) for segment in item.path.rstrip('/').split('/')[:-1]]
+        results.append({
+            'type': 'item',
+            'id': item.id,
+            'description': item.description,
+            'complete': item.complete,
+            'list': {'id': item.list_id, 'name': lists.get(item.list_id)},
+            'ancestors': [
+                {'id': ancestor_id, 'description': items[ancestor_id].description}
+                for ancestor_id in ancestor_ids if ancestor_id in items
+            ]
+        })
+    return results, (offset + limit if has_more else None)
+
+
+def rebuild_search_index():
+    """Re-index every list and item from scratch. Does not commit."""
+    db.session.execute(text('DELETE FROM search_index'))
+    db.session.execute(text(
+        "INSERT INTO search_index (rowid, body, owner) "
+        "SELECT -id, name, 'u' || user_id FROM todo_list"
+    ))
+    db.session.execute(text(
+        "INSERT INTO search_index (rowid, body, owner) "
+        "SELECT todo_item.id, todo_item.description, 'u' || todo_list.user_id "
+        "FROM todo_item JOIN todo_list ON todo_item.list_id = todo_list.id"
+    ))
+    db.session.execute(text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
@@ -0,0 +1,110 @@
+"""The one place JSON responses are shaped and encoded.
+
+Item trees are built straight from row tuples holding only the requested
+fields, never from ORM instances, and every payload is encoded to bytes
+once: with orjson when it is installed (``JSON_ENCODER=auto``), with the
+standard library otherwise. The Flask JSON provider below routes
+``jsonify`` through the same encoder and hands the bytes to the response
+without a str round trip.
+"""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+from .models import PATH_SEGMENT_WIDTH
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def get_encoder(name='auto'):
+    """Return a function encoding an object to UTF-8 JSON bytes.
+
+    ``name`` is 'orjson', 'stdlib' or 'auto' (orjson when available).
+    """
+    if name == 'orjson' or (name == 'auto' and orjson is not None):
+        if orjson is None:
+            raise RuntimeError('JSON_ENCODER=orjson requires the orjson package')
+        return _orjson_dumps
+    if name not in ('auto', 'stdlib'):
+        raise ValueError(f'Unknown JSON encoder {name!r}')
+    return _stdlib_dumps
+
+
+def _orjson_dumps(obj):
+    # Dates go through the same default as with the stdlib, int keys become strings
+    return orjson.dumps(
+        obj, default=DefaultJSONProvider.default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    )
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(
+        obj, default=DefaultJSONProvider.default, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+dumps = get_encoder()
+
+
+class JSONProvider(DefaultJSONProvider):
+    """``app.json`` backed by ``get_encoder(JSON_ENCODER)``; ``encode`` returns bytes."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._encode = get_encoder(app.config.get('JSON_ENCODER', 'auto'))
+
+    def encode(self, obj):
+        return self._encode(obj)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Explicit json.dumps options (indent, sort_keys...) keep the stdlib behaviour
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.encode(obj), mimetype=self.mimetype)
+
+
+def item_forest(rows, max_depth, fields=('description', 'complete', 'collapsed'), orphans=False):
+    """Assemble ``(id, *fields, parent_id, list_id, path)`` rows into nested nodes.
+
+    ``fields`` names the row values between the id and the parent id, except
+    'collapsed', which is not a column: it adds ``collapsed: false`` to every
+    top-level node. Returns ``(list_id, node)`` for every top-level row in
+    row order and, with ``orphans``, for every row whose parent is not among
+    the rows, which then carries its ``parent_id``. Children keep row order.
+    Nodes at depth ``max_depth - 1`` carry no ``children`` key; None means
+    no limit.
+    """
+    keys = ('id',) + tuple(field for field in fields if field != 'collapsed')
+    collapsed = len(keys) <= len(fields)
+    # An item at depth d has a path of d + 1 segments
+    leaf_path = None if max_depth is None else max_depth * (PATH_SEGMENT_WIDTH + 1)
+
+    # First pass: one node per item, second pass: hook each node to its parent
+    nodes = {}
+    for row in rows:
+        node = dict(zip(keys, row))
+        if leaf_path is None or len(row[-1]) < leaf_path:
+            node['children'] = []
+        nodes[row[0]] = node
+
+    roots = []
+    for row in rows:
+        node, parent_id, list_id = nodes[row[0]], row[-3], row[-2]
+        if parent_id is None:
+            if collapsed:
+                node['collapsed'] = False  # This will be managed on the frontend
+            roots.append((list_id, node))
+        elif parent_id in nodes:
+            nodes[parent_id]['children'].append(node)
+        elif orphans:
+            node['parent_id'] = parent_id
+            roots.append((list_id, node))
+    return roots
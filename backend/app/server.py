@@ -0,0 +1,56 @@
+"""Production serving: the preloaded app under a pre-forking gunicorn master.
+
+``create_app()`` runs once in the master, so workers share its memory
+pages copy-on-write. SIGHUP makes the master replace its workers
+gracefully; SIGTERM drains them and exits. Because the app is preloaded,
+new application code needs a full restart rather than a SIGHUP.
+"""
+from .logs import restart_after_fork
+from .passwords import init_password_hasher
+from .storage import dispose_engines
+
+
+def gunicorn_options(app):
+    config = app.config
+    threads = config['SERVER_THREADS']
+    return {
+        'bind': config['SERVER_BIND'],
+        'workers': config['SERVER_WORKERS'],
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'preload_app': True,
+        'max_requests': config['SERVER_MAX_REQUESTS'],
+        'max_requests_jitter': config['SERVER_MAX_REQUESTS_JITTER'],
+        'timeout': config['SERVER_TIMEOUT'],
+        'graceful_timeout': config['SERVER_GRACEFUL_TIMEOUT'],
+        'keepalive': config['SERVER_KEEPALIVE'],
+        'post_fork': lambda server, worker: _reset_worker(app),
+    }
+
+
+def serve(app):
+    """Run ``app`` under gunicorn until the master is stopped; needs the gunicorn package."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError as e:
+        raise RuntimeError('Production serving requires the gunicorn package') from e
+
+    # Every worker gets its own hashing pool, so the configured size is split between them
+    init_password_hasher(app, processes=app.config['SERVER_WORKERS'])
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in gunicorn_options(app).items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    Server().run()
+
+
+def _reset_worker(app):
+    # Connections and the log writer thread belong to the master; each worker needs its own
+    with app.app_context():
+        dispose_engines(app)
+    restart_after_fork()
@@ -0,0 +1,81 @@
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from . import db
+
+
+def configure_engine_options(app):
+    """Fill ``SQLALCHEMY_ENGINE_OPTIONS`` from the storage profile; call before ``db.init_app``."""
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    # In-memory SQLite runs on a single static connection, which takes no pool sizing
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return
+    options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+
+
+def init_storage(app):
+    """Apply the profile's pragmas to every new connection and set up the read pool."""
+    pragmas = {name: value for name, value in app.config['SQLITE_PRAGMAS'].items() if value is not None}
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    if pragmas:
+        event.listen(engine, 'connect', _pragma_setter(pragmas))
+
+    read_pool_size = app.config['DB_READ_POOL_SIZE']
+    database = engine.url.database
+    if read_pool_size and database and database != ':memory:':
+        read_engine = create_engine(
+            engine.url.set(database=f'file:{database}', query={'mode': 'ro', 'uri': 'true'}),
+            pool_size=read_pool_size,
+            max_overflow=app.config['DB_MAX_OVERFLOW'],
+            pool_timeout=app.config['DB_POOL_TIMEOUT'],
+        )
+        event.listen(read_engine, 'connect', _pragma_setter(
+            {name: value for name, value in pragmas.items() if name != 'journal_mode'},
+            query_only=True
+        ))
+        app.extensions['read_engine'] = read_engine
+        app.extensions['read_sessionmaker'] = sessionmaker(bind=read_engine)
+        app.teardown_appcontext(_close_read_session)
+
+
+def dispose_engines(app):
+    """Forget pooled connections inherited from a parent process, without closing them for it."""
+    db.engine.dispose(close=False)
+    read_engine = app.extensions.get('read_engine')
+    if read_engine is not None:
+        read_engine.dispose(close=False)
+
+
+def reader():
+    """Session for queries: the read-only pool during GET requests, else ``db.session``."""
+    make_session = current_app.extensions.get('read_sessionmaker')
+    if make_session is None or not has_request_context() or request.method != 'GET':
+        return db.session
+    if 'read_session' not in g:
+        g.read_session = make_session()
+    return g.read_session
+
+
+def _close_read_session(exception=None):
+    session = g.pop('read_session', None)
+    if session is not None:
+        session.close()
+
+
+def _pragma_setter(pragmas, query_only=False):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        if query_only:
+            cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
+    return set_pragmas
@@ -0,0 +1,170 @@
+from datetime import datetime
+
+from sqlalchemy import delete, event, func, insert, select, update
+
+from . import db
+from .models import User, TodoList, TodoItem, ChangeLog
+from .cache import invalidate_lists
+from .storage import reader
+
+
+def bump_version(user_id):
+    """Advance ``user_id``'s data version and return the new value.
+
+    Called by every mutation; the counter moves once per transaction no
+    matter how many rows the transaction touches.
+    """
+    bumped = db.session.info.setdefault('bumped_versions', {})
+    if user_id not in bumped:
+        bumped[user_id] = db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(data_version=User.data_version + 1)
+            .returning(User.data_version)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+    return bumped[user_id]
+
+
+def record_changes(user_id, entity, entity_ids, action):
+    """Bump the user's version and log ``action`` for each of ``entity_ids``.
+
+    The rows go into the current transaction, so the log commits or rolls
+    back together with the mutation it describes.
+    """
+    version = bump_version(user_id)
+    rows = [
+        {'user_id': user_id, 'version': version, 'entity': entity,
+         'entity_id': entity_id, 'action': action}
+        for entity_id in entity_ids
+    ]
+    if rows:
+        db.session.execute(insert(ChangeLog), rows)
+    return version
+
+
+def record_change(user_id, entity, entity_id, action='upsert'):
+    return record_changes(user_id, entity, [entity_id], action)
+
+
+def force_resync(user_id):
+    """Bump the user's version without logging the changes; delta clients will resync.
+
+    For bulk writes where a change entry per row would cost more than
+    clients reloading their lists once.
+    """
+    version = bump_version(user_id)
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(changes_compacted_version=version)
+        .execution_options(synchronize_session=False)
+    )
+    return version
+
+
+def changes_since(user_id, since):
+    """Return what changed for ``user_id`` after version ``since``.
+
+    The answer holds the current state of every list and item upserted
+    since the cursor, the ids of those deleted, and the new cursor. If the
+    log no longer reaches back to ``since`` the client is told to resync.
+    """
+    session = reader()
+    version, compacted = session.query(
+        User.data_version, User.changes_compacted_version
+    ).filter(User.id == user_id).one()
+    if since < compacted or since > version:
+        return {'resync': True, 'cursor': version}
+
+    # Only the latest action per entity matters
+    latest = {}
+    rows = session.execute(
+        select(ChangeLog.entity, ChangeLog.entity_id, ChangeLog.action)
+        .where(ChangeLog.user_id == user_id, ChangeLog.version > since)
+        .order_by(ChangeLog.id)
+    )
+    for entity, entity_id, action in rows:
+        latest[(entity, entity_id)] = action
+
+    upserted = {'list': [], 'item': []}
+    deleted = {'list': [], 'item': []}
+    for (entity, entity_id), action in latest.items():
+        (upserted if action == 'upsert' else deleted)[entity].append(entity_id)
+
+    lists = []
+    if upserted['list']:
+        lists = [
+            {'id': list_id, 'name': name}
+            for list_id, name in session.execute(
+                select(TodoList.id, TodoList.name)
+                .where(TodoList.id.in_(upserted['list']), TodoList.user_id == user_id)
+            )
+        ]
+    items = []
+    if upserted['item']:
+        items = [
+            {'id': item_id, 'description': description, 'complete': complete,
+             'parent_id': parent_id, 'list_id': list_id, 'position': position}
+            for item_id, description, complete, parent_id, list_id, position in session.execute(
+                select(TodoItem.id, TodoItem.description, TodoItem.complete,
+                       TodoItem.parent_id, TodoItem.list_id, TodoItem.position)
+                .join(TodoList, TodoItem.list_id == TodoList.id)
+                .where(TodoItem.id.in_(upserted['item']), TodoList.user_id == user_id)
+            )
+        ]
+
+    return {
+        'resync': False,
+        'cursor': version,
+        'lists': {'upserted': lists, 'deleted': deleted['list']},
+        'items': {'upserted': items, 'deleted': deleted['item']}
+    }
+
+
+def compact_changes(retention):
+    """Drop change log entries older than ``retention`` (a timedelta).
+
+    Each affected user remembers the newest version that was dropped, so
+    clients holding an older cursor get told to resync. Returns the number
+    of entries removed. Does not commit.
+    """
+    cutoff = datetime.utcnow() - retention
+    expired = ChangeLog.created_at < cutoff
+    newest_dropped = (
+        select(func.max(ChangeLog.version))
+        .where(ChangeLog.user_id == User.id, expired)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(User)
+        .where(User.id.in_(select(ChangeLog.user_id).where(expired)))
+        # SQLite's two-argument max(): never lower a version force_resync set after these entries
+        .values(changes_compacted_version=func.max(User.changes_compacted_version, newest_dropped))
+        .execution_options(synchronize_session=False)
+    )
+    result = db.session.execute(
+        delete(ChangeLog).where(expired).execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def current_version(user_id):
+    # A primary key lookup that never touches the list or item tables
+    return reader().query(User.data_version).filter(User.id == user_id).scalar()
+
+
+def version_etag(user_id, version):
+    return f'{user_id}-{version}'
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed_versions(session):
+    bumped = session.info.pop('bumped_versions', None)
+    if bumped:
+        invalidate_lists(bumped)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _reset_bumped_versions(session):
+    session.info.pop('bumped_versions', None)
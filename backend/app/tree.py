@@ -0,0 +1,440 @@
+from itertools import groupby
+
+from sqlalchemy import bindparam, case, delete, func, or_, select, text, tuple_, update
+from sqlalchemy.orm import aliased
+
+from . import db
+from .storage import reader
+from .models import TodoList, TodoItem, PATH_SEGMENT_WIDTH, path_segment
+from .ordering import iter_keys
+from .serialize import dumps as encode_json, item_forest
+
+
+# Plain table columns: Core selects return row tuples without the ORM's per-row overhead
+_items = TodoItem.__table__
+
+# Fields a list read can ask for, by table; 'collapsed' is a constant, not a column
+LIST_FIELDS = {
+    'name': TodoList.name,
+    'item_count': TodoList.item_count,
+    'completed_count': TodoList.completed_count,
+}
+ITEM_FIELDS = {
+    'description': _items.c.description,
+    'complete': _items.c.complete,
+    'parent_id': _items.c.parent_id,
+    'position': _items.c.position,
+    'descendant_count': _items.c.descendant_count,
+    'completed_descendant_count': _items.c.completed_descendant_count,
+    'collapsed': None,
+}
+DEFAULT_FIELDS = ('name', 'description', 'complete', 'collapsed')
+
+
+def load_list_trees(user_id, list_ids=None, max_depth=3, fields=DEFAULT_FIELDS,
+                    complete=None, updated_since=None):
+    """Load a user's lists and their nested items in two queries.
+
+    Lists come from one SELECT on ``todo_list``; every item of those lists
+    comes from one SELECT joined on ``TodoList.user_id``. The hierarchy is
+    then assembled in memory through an id -> node map, so the number of
+    queries does not depend on how many items or levels the user has.
+    Items nested deeper than ``max_depth`` levels are filtered out in SQL
+    via ``TodoItem.depth``. Siblings come in ``TodoItem.position`` order.
+
+    Only the columns named in ``fields`` (keys of ``LIST_FIELDS`` and
+    ``ITEM_FIELDS``) are read. ``complete`` and ``updated_since`` keep the
+    items in that state or updated at or after that time (see
+    ``item_filters``); an item whose parent was filtered out comes at the
+    top level of its list with its ``parent_id``.
+    """
+    list_fields = tuple(field for field in fields if field in LIST_FIELDS)
+    item_fields = tuple(field for field in fields if field in ITEM_FIELDS)
+    list_query = reader().query(TodoList.id, *(LIST_FIELDS[field] for field in list_fields)).filter(
+        TodoList.user_id == user_id
+    )
+    if list_ids is not None:
+        list_query = list_query.filter(TodoList.id.in_(list_ids))
+
+    lists = []
+    for row in list_query.order_by(TodoList.id):
+        lst = dict(zip(('id',) + list_fields, row))
+        lst['items'] = []
+        lists.append(lst)
+    if max_depth < 1 or not lists:
+        return lists
+    lists_by_id = {lst['id']: lst for lst in lists}
+
+    item_query = (
+        select(*_item_columns(item_fields))
+        .join(TodoList.__table__, _items.c.list_id == TodoList.id)
+        .where(TodoList.user_id == user_id, *item_filters(max_depth, complete, updated_since))
+    )
+    if list_ids is not None:
+        item_query = item_query.where(_items.c.list_id.in_(list_ids))
+    orphans = complete is not None or updated_since is not None
+    # Orphans come where their subtree is, as in iter_list_trees_json; without
+    # them both orders build the same trees and the plain one is cheaper
+    order = tree_order() if orphans else (_items.c.position, _items.c.id)
+    rows = _item_rows(item_query.order_by(*order))
+    for list_id, root in item_forest(rows, max_depth, item_fields, orphans):
+        lists_by_id[list_id]['items'].append(root)
+    return lists
+
+
+def load_list_summaries(user_id):
+    """Names and completion counters of a user's lists, without their items."""
+    return [
+        {'id': list_id, 'name': name, 'item_count': item_count, 'completed_count': completed_count}
+        for list_id, name, item_count, completed_count in reader().query(
+            TodoList.id, TodoList.name, TodoList.item_count, TodoList.completed_count
+        ).filter(TodoList.user_id == user_id).order_by(TodoList.id)
+    ]
+
+
+def load_item_page(list_id, after=None, limit=50, max_depth=3, fields=DEFAULT_FIELDS):
+    """Return one keyset page of a list's top-level items with their subtrees.
+
+    Top-level items are ordered by position and the page starts after the
+    cursor ``after``, a ``'<position>:<id>'`` string returned with the
+    previous page; it holds the sort key itself, so the page still starts
+    in the right place if that item has been moved or deleted since.
+    Descendants of the page's roots come from one bounded range scan on
+    ``TodoItem.path`` per root, reading the ``ITEM_FIELDS`` named in
+    ``fields``. Returns ``(items, next_cursor)``, where ``next_cursor`` is
+    None on the last page. Raises ValueError for a malformed cursor.
+    """
+    item_fields = tuple(field for field in fields if field in ITEM_FIELDS)
+    root_query = reader().query(TodoItem.position, TodoItem.id).filter(
+        TodoItem.sibling_filter(list_id, None)
+    )
+    if after is not None:
+        after_position, after_id = _parse_page_cursor(after)
+        root_query = root_query.filter(
+            tuple_(TodoItem.position, TodoItem.id) > tuple_(after_position, after_id)
+        )
+    roots = root_query.order_by(TodoItem.position, TodoItem.id).limit(limit + 1).all()
+    has_more = len(roots) > limit
+    roots = roots[:limit]
+    if not roots:
+        return [], None
+
+    # Roots in position order are scattered over the id range, so each
+    # subtree gets its own range on the path index (a multi-index OR)
+    rows = _item_rows(
+        select(*_item_columns(item_fields))
+        .where(
+            or_(*(TodoItem.subtree_filter(path_segment(root_id)) for _, root_id in roots)),
+            _items.c.depth < max_depth,
+        )
+        .order_by(_items.c.position, _items.c.id)
+    )
+    items = [root for _, root in item_forest(rows, max_depth, item_fields)]
+    next_cursor = '%s:%d' % tuple(roots[-1]) if has_more else None
+    return items, next_cursor
+
+
+def _parse_page_cursor(cursor):
+    # Positions are base-62 keys, so the last ':' separates the id
+    position, separator, item_id = cursor.rpartition(':')
+    if not separator or not position or not item_id.isdigit():
+        raise ValueError(f'Invalid page cursor {cursor!r}')
+    return position, int(item_id)
+
+
+def load_item_subtree(path):
+    """Return the item at ``path`` with all of its descendants, each node carrying its ``parent_id``."""
+    fields = ('description', 'complete', 'parent_id')
+    rows = _item_rows(
+        select(*_item_columns(fields))
+        .where(TodoItem.subtree_filter(path))
+        .order_by(_items.c.position, _items.c.id)
+    )
+    roots = item_forest(rows, max_depth=None, fields=fields, orphans=True)
+    return roots[0][1] if roots else None
+
+
+def iter_list_trees_json(user_id, max_depth=3, dumps=encode_json, batch_size=1000, list_ids=None,
+                         fields=DEFAULT_FIELDS, complete=None, updated_since=None):
+    """Yield the ``{"lists": [...]}`` document of ``load_list_trees`` as bytes chunks.
+
+    Takes the same filters. Items are read in a single query ordered by
+    list and subtree (see ``tree_order``) and fetched ``batch_size`` rows
+    at a time. Each top-level item is encoded with ``dumps`` (object to
+    bytes) as soon as its subtree is complete, so memory stays bounded by
+    the largest subtree instead of the whole account.
+    """
+    list_fields = tuple(field for field in fields if field in LIST_FIELDS)
+    item_fields = tuple(field for field in fields if field in ITEM_FIELDS)
+    list_query = reader().query(TodoList.id, *(LIST_FIELDS[field] for field in list_fields)).filter(
+        TodoList.user_id == user_id
+    )
+    item_query = (
+        select(*_item_columns(item_fields))
+        .join(TodoList.__table__, _items.c.list_id == TodoList.id)
+        .where(TodoList.user_id == user_id, *item_filters(max_depth, complete, updated_since))
+    )
+    if list_ids is not None:
+        list_query = list_query.filter(TodoList.id.in_(list_ids))
+        item_query = item_query.where(_items.c.list_id.in_(list_ids))
+    lists = list_query.order_by(TodoList.id).all()
+
+    rows = ()
+    if max_depth >= 1 and lists:
+        rows = reader().connection().execution_options(yield_per=batch_size).execute(
+            item_query.order_by(*tree_order())
+        )
+    subtrees = groupby(rows, key=lambda row: (row[-2], row[-1][:PATH_SEGMENT_WIDTH + 1]))
+    pending = next(subtrees, None)
+    orphans = complete is not None or updated_since is not None
+
+    yield b'{"lists":['
+    for index, row in enumerate(lists):
+        # The list object up to its closing brace, then its items one subtree at a time
+        head = dumps(dict(zip(('id',) + list_fields, row)))[:-1]
+        yield b'%s%s,"items":[' % (b',' if index else b'', head)
+        first = True
+        while pending is not None and pending[0][0] == row[0]:
+            for _, node in item_forest(list(pending[1]), max_depth, item_fields, orphans):
+                yield dumps(node) if first else b',' + dumps(node)
+                first = False
+            pending = next(subtrees, None)
+        yield b']}'
+    yield b']}'
+
+
+def tree_order():
+    """ORDER BY terms listing each list's subtrees in root position order.
+
+    Rows of one subtree are contiguous, parents come before their children
+    and siblings follow their positions. Joins the root through the first
+    path segment, so the query must select from ``TodoItem``.
+    """
+    root = aliased(TodoItem)
+    return (
+        TodoItem.list_id,
+        select(root.position)
+        .where(root.path == func.substr(TodoItem.path, 1, PATH_SEGMENT_WIDTH + 1))
+        .scalar_subquery(),
+        func.substr(TodoItem.path, 1, PATH_SEGMENT_WIDTH + 1),
+        TodoItem.depth,
+        TodoItem.position,
+        TodoItem.id,
+    )
+
+
+def item_filters(max_depth, complete=None, updated_since=None):
+    """WHERE terms for items above ``max_depth``, in state ``complete``, updated since ``updated_since``."""
+    filters = [_items.c.depth < max_depth]
+    if complete is not None:
+        # Items created before completion had a default may hold NULL, which counts as not complete
+        filters.append(_items.c.complete.is_(True) if complete else _items.c.complete.is_not(True))
+    if updated_since is not None:
+        filters.append(_items.c.updated_at >= updated_since)
+    return filters
+
+
+def _item_columns(fields):
+    # The row layout item_forest expects
+    return (
+        _items.c.id,
+        *(ITEM_FIELDS[field] for field in fields if ITEM_FIELDS[field] is not None),
+        _items.c.parent_id,
+        _items.c.list_id,
+        _items.c.path,
+    )
+
+
+def _item_rows(statement):
+    return reader().connection().execute(statement).all()
+
+
+def delete_subtree(path):
+    """Delete the item at ``path`` and all of its descendants.
+
+    Runs as a single DELETE over the path range without loading any rows
+    into the session. Returns the ids of the removed items.
+    """
+    if not path:
+        raise ValueError('Cannot delete a subtree without a materialized path')
+    result = db.session.execute(
+        delete(TodoItem)
+        .where(TodoItem.subtree_filter(path))
+        .returning(TodoItem.id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalars().all()
+
+
+def subtree_height(path):
+    """Levels below the item at ``path``: 0 for a leaf, 1 if it only has children, and so on."""
+    return db.session.execute(
+        select(func.max(TodoItem.depth) - func.min(TodoItem.depth)).where(TodoItem.subtree_filter(path))
+    ).scalar() or 0
+
+
+def move_subtree(item, list_id, parent, position):
+    """Re-root the subtree of ``item`` under ``parent`` (None for top level) in ``list_id``.
+
+    One UPDATE over the subtree's path range rewrites every row's path
+    prefix, depth and list, and the moved item's parent and position.
+    Objects already in the session are refreshed. Returns the ids of the
+    moved items; the caller checks depth and cycles first.
+    """
+    old_prefix = item.ancestor_path
+    new_prefix = parent.path if parent is not None else ''
+    depth_delta = (parent.depth + 1 if parent is not None else 0) - item.depth
+    parent_id = parent.id if parent is not None else None
+    result = db.session.execute(
+        update(TodoItem)
+        .where(TodoItem.subtree_filter(item.path))
+        .values(
+            path=new_prefix + func.substr(TodoItem.path, len(old_prefix) + 1),
+            depth=TodoItem.depth + depth_delta,
+            list_id=list_id,
+            parent_id=case((TodoItem.id == item.id, parent_id), else_=TodoItem.parent_id),
+            position=case((TodoItem.id == item.id, position), else_=TodoItem.position),
+        )
+        .returning(TodoItem.id)
+        .execution_options(synchronize_session='fetch')
+    )
+    return result.scalars().all()
+
+
+def adjust_counters(list_id, ancestor_path, items, completed):
+    """Add ``items`` and ``completed`` to the counters of a list and of the items on ``ancestor_path``.
+
+    ``ancestor_path`` is the path of the lowest ancestor whose subtree
+    changed, '' when only the list is affected. Takes one UPDATE for the
+    ancestors and one for the list however large the subtree is.
+    """
+    if not items and not completed:
+        return
+    ancestor_ids = [int(segment) for segment in ancestor_path.split('/') if segment]
+    if ancestor_ids:
+        db.session.execute(
+            update(TodoItem)
+            .where(TodoItem.id.in_(ancestor_ids))
+            .values(
+                descendant_count=TodoItem.descendant_count + items,
+                completed_descendant_count=TodoItem.completed_descendant_count + completed,
+            )
+            .execution_options(synchronize_session='fetch')
+        )
+    db.session.execute(
+        update(TodoList)
+        .where(TodoList.id == list_id)
+        .values(
+            item_count=TodoList.item_count + items,
+            completed_count=TodoList.completed_count + completed,
+        )
+        .execution_options(synchronize_session='fetch')
+    )
+
+
+def last_position(list_id, parent_id):
+    """Position of the last item among the siblings, or None if there are none."""
+    return db.session.execute(
+        select(func.max(TodoItem.position)).where(TodoItem.sibling_filter(list_id, parent_id))
+    ).scalar()
+
+
+def next_position(item, position):
+    """Smallest sibling position of ``item`` after ``position`` (None: from the start)."""
+    query = select(func.min(TodoItem.position)).where(
+        TodoItem.sibling_filter(item.list_id, item.parent_id), TodoItem.id != item.id
+    )
+    if position is not None:
+        query = query.where(TodoItem.position > position)
+    return db.session.execute(query).scalar()
+
+
+def rebalance_siblings(list_id, parent_id):
+    """Give a sibling group the shortest keys that keep its order.
+
+    Rewrites every row of the group, so it is only run once keys have grown
+    long. Returns the ids of the items whose position changed.
+    """
+    rows = db.session.execute(
+        select(TodoItem.id, TodoItem.position)
+        .where(TodoItem.sibling_filter(list_id, parent_id))
+        .order_by(TodoItem.position, TodoItem.id)
+    ).all()
+    changed = [
+        {'item_id': item_id, 'position': key}
+        for (item_id, position), key in zip(rows, iter_keys()) if position != key
+    ]
+    if changed:
+        db.session.execute(
+            update(TodoItem.__table__)
+            .where(TodoItem.__table__.c.id == bindparam('item_id'))
+            .values(position=bindparam('position')),
+            changed
+        )
+        # The UPDATE bypassed the session; reload positions it may hold
+        for obj in list(db.session.identity_map.values()):
+            if isinstance(obj, TodoItem):
+                db.session.expire(obj, ['position'])
+    return [row['item_id'] for row in changed]
+
+
+def list_tree_item_ids(list_id):
+    return [item_id for (item_id,) in db.session.execute(
+        select(TodoItem.id).where(TodoItem.list_id == list_id)
+    )]
+
+
+def delete_list_tree(list_id):
+    """Delete a list and all of its items in two statements.
+
+    Returns the number of items removed (the list row itself not included).
+    """
+    result = db.session.execute(
+        delete(TodoItem)
+        .where(TodoItem.list_id == list_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        delete(TodoList)
+        .where(TodoList.id == list_id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+_SUBTREE = (
+    "FROM todo_item AS below "
+    "WHERE below.path > todo_item.path AND below.path < todo_item.path || '~'"
+)
+_ITEM_COUNTERS = {
+    'descendant_count': f'(SELECT count(*) {_SUBTREE})',
+    'completed_descendant_count': f'(SELECT count(*) {_SUBTREE} AND below.complete)',
+}
+_LIST_COUNTERS = {
+    'item_count': '(SELECT count(*) FROM todo_item WHERE todo_item.list_id = todo_list.id)',
+    'completed_count': (
+        '(SELECT count(*) FROM todo_item '
+        'WHERE todo_item.list_id = todo_list.id AND todo_item.complete)'
+    ),
+}
+
+
+def check_counters(repair=False):
+    """Count the lists and items whose completion counters disagree with their rows.
+
+    With ``repair``, recompute those counters from the rows instead
+    (without committing). Returns ``(lists, items)``.
+    """
+    found = []
+    for table, counters in (('todo_list', _LIST_COUNTERS), ('todo_item', _ITEM_COUNTERS)):
+        wrong = ' OR '.join(f'{column} != {count}' for column, count in counters.items())
+        if repair:
+            assignments = ', '.join(f'{column} = {count}' for column, count in counters.items())
+            found.append(db.session.execute(
+                text(f'UPDATE {table} SET {assignments} WHERE {wrong}')
+            ).rowcount)
+        else:
+            found.append(db.session.execute(
+                text(f'SELECT count(*) FROM {table} WHERE {wrong}')
+            ).scalar())
+    return tuple(found)
@@ -0,0 +1,474 @@
+"""Load and latency benchmark for the routes in app/routes.py.
+
+Seeds a deterministic dataset into a throwaway SQLite database, drives
+every route through the Flask test client (or a real HTTP server with
+--server) and writes throughput, p50/p95/p99 latency, SQL statements per
+request, CPU time per request, bytes per response and peak RSS as JSON.
+With --compare it fails when a route's p95 latency regressed by more than
+--threshold against an earlier run.
+
+The /debug* routes (diagnostics, not part of serving) and the form-based
+/item/<id>/subitem/new (its templates are not part of this app) are left
+out; new_item with a parent_id covers creating sub-items.
+
+    cd backend
+    python -m benchmarks.bench --users 5 --lists 10 --fanout 20,5,3 --output bench.json
+    python -m benchmarks.bench --compare bench.json --threshold 0.25
+
+Serialization cost on a 10k-item account, without the list cache and
+with the peak memory allocated per request (slower while tracing):
+
+    python -m benchmarks.bench --users 1 --lists 10 --fanout 10,10,10 --no-cache --allocations \
+        --routes get_lists,get_lists_stream,dashboard,toggle_item_complete --json-encoder stdlib
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+
+PASSWORD = 'benchmark-password'
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--lists', type=int, default=5, help='lists per user')
+    parser.add_argument('--fanout', default='10,3,2',
+                        help='items per list, children per item, grandchildren per child')
+    parser.add_argument('--requests', type=int, default=100, help='timed requests per route')
+    parser.add_argument('--seed', type=int, default=162)
+    parser.add_argument('--server', action='store_true', help='go through a real socket server')
+    parser.add_argument('--routes', help='comma-separated subset of route names to run')
+    parser.add_argument('--output', help='write the results JSON here')
+    parser.add_argument('--compare', help='results JSON of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative p95 slowdown per route with --compare')
+    parser.add_argument('--no-cache', action='store_true', help='disable the list cache')
+    parser.add_argument('--json-encoder', choices=('auto', 'orjson', 'stdlib'),
+                        help='JSON_ENCODER of the app under test')
+    parser.add_argument('--allocations', action='store_true',
+                        help='trace the peak memory allocated per request')
+    return parser.parse_args(argv)
+
+
+def make_app(database_path):
+    # Configuration is read from the environment when config is first imported
+    os.environ['DATABASE_URL'] = f'sqlite:///{database_path}'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app import create_app
+    return create_app()
+
+
+def seed(app, users, lists_per_user, fanout, rng):
+    """Insert the synthetic dataset with bulk statements; returns the usernames."""
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from app.models import User, TodoList, TodoItem, path_segment
+    from app.ordering import iter_keys
+
+    password = generate_password_hash(PASSWORD, app.config['PASSWORD_HASH_METHOD'])
+    usernames = [f'user{n}' for n in range(users)]
+    next_item_id = 1
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {'id': n + 1, 'username': name, 'password': password}
+            for n, name in enumerate(usernames)
+        ])
+        list_rows = []
+        item_rows = []
+        for user_id in range(1, users + 1):
+            for _ in range(lists_per_user):
+                list_id = len(list_rows) + 1
+                list_row = {'id': list_id, 'name': f'List {list_id}', 'user_id': user_id}
+                list_rows.append(list_row)
+
+                def add_items(parent, level):
+                    # Returns how many items were added below parent and how many are complete
+                    nonlocal next_item_id
+                    added = completed = 0
+                    if level >= len(fanout):
+                        return added, completed
+                    positions = iter_keys()
+                    for _ in range(fanout[level]):
+                        item_id = next_item_id
+                        next_item_id += 1
+                        path = (parent['path'] if parent else '') + path_segment(item_id)
+                        row = {
+                            'id': item_id,
+                            'description': f'Task {item_id}',
+                            'complete': rng.random() < 0.3,
+                            'parent_id': parent['id'] if parent else None,
+                            'list_id': list_id,
+                            'depth': level,
+                            'path': path,
+                            'position': next(positions),
+                        }
+                        item_rows.append(row)
+                        below, below_completed = add_items(row, level + 1)
+                        row['descendant_count'] = below
+                        row['completed_descendant_count'] = below_completed
+                        added += below + 1
+                        completed += below_completed + row['complete']
+                    return added, completed
+
+                list_row['item_count'], list_row['completed_count'] = add_items(None, 0)
+        db.session.execute(insert(TodoList), list_rows)
+        for start in range(0, len(item_rows), 5000):
+            db.session.execute(insert(TodoItem), item_rows[start:start + 5000])
+        db.session.commit()
+    return usernames, len(list_rows), len(item_rows)
+
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        if isinstance(body, bytes):
+            response = self.client.open(path, method=method, data=body,
+                                        content_type='application/x-ndjson')
+        else:
+            response = self.client.open(path, method=method, json=body)
+        data = response.get_data()
+        return response.status_code, data
+
+    def close(self):
+        pass
+
+
+class SocketDriver:
+    """Talks HTTP/1.1 to a werkzeug server over a keep-alive connection, carrying cookies."""
+
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection('127.0.0.1', port)
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, body=None):
+        headers = {}
+        if isinstance(body, bytes):
+            headers['Content-Type'] = 'application/x-ndjson'
+        elif body is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(body)
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={m.value}' for k, m in self.cookies.items())
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        data = response.read()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            self.cookies.load(header)
+        return response.status, data
+
+    def close(self):
+        self.conn.close()
+
+
+def start_server(app):
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Workload:
+    """Resolves ids for a logged-in user so each scenario can build its request."""
+
+    def __init__(self, driver, rng, username):
+        self.driver = driver
+        self.rng = rng
+        self.username = username
+        self.registered = itertools.count()
+
+    def call(self, method, path, body=None):
+        status, data = self.driver.request(method, path, body)
+        if status >= 400:
+            raise RuntimeError(f'{method} {path} -> {status}: {data[:200]!r}')
+        return json.loads(data) if data else None
+
+    def login(self):
+        self.call('POST', '/login', {'username': self.username, 'password': PASSWORD})
+
+    def new_username(self):
+        return f'bench-registered{next(self.registered)}'
+
+    def lists(self):
+        return self.call('GET', '/api/lists')['lists']
+
+    def some_list(self):
+        return self.rng.choice(self.lists())['id']
+
+    def new_item(self, list_id, parent_id=None):
+        body = {'description': 'bench item'}
+        if parent_id:
+            body['parent_id'] = parent_id
+        return self.call('POST', f'/list/{list_id}/item/new', body)['id']
+
+    def new_list(self):
+        return self.call('POST', '/api/lists', {'name': 'bench list'})['id']
+
+
+# Each scenario maps the workload to (method, path, body); preparation
+# calls made inside it are not timed.
+SCENARIOS = {
+    'home': lambda w: ('GET', '/', None),
+    'healthz': lambda w: ('GET', '/healthz', None),
+    'readyz': lambda w: ('GET', '/readyz', None),
+    'metrics': lambda w: ('GET', '/metrics', None),
+    'register': lambda w: ('POST', '/register', {'username': w.new_username(), 'password': PASSWORD}),
+    'login': lambda w: ('POST', '/login', {'username': w.username, 'password': PASSWORD}),
+    'logout': lambda w: _logout(w),
+    'check_session': lambda w: ('GET', '/check-session', None),
+    'get_lists': lambda w: ('GET', '/api/lists', None),
+    'get_lists_stream': lambda w: ('GET', '/api/lists?stream=1', None),
+    'get_lists_sidebar': lambda w: ('GET', '/api/lists?fields=name,item_count,completed_count&depth=0', None),
+    'get_lists_open': lambda w: ('GET', '/api/lists?fields=name,description&complete=false', None),
+    'list_summary': lambda w: ('GET', '/api/lists/summary', None),
+    'dashboard': lambda w: ('GET', '/dashboard', None),
+    'list_items_page': lambda w: ('GET', f'/api/lists/{w.some_list()}/items?limit=20', None),
+    'changes': lambda w: ('GET', '/api/changes?since=0', None),
+    'search': lambda w: ('GET', f'/api/search?q=Task+{w.rng.randint(1, 99)}', None),
+    'export': lambda w: ('GET', '/api/export', None),
+    'import': lambda w: ('POST', '/api/import', IMPORT_BODY),
+    'create_list': lambda w: ('POST', '/api/lists', {'name': 'bench list'}),
+    'new_list': lambda w: ('POST', '/list/new', {'name': 'bench list'}),
+    'new_item': lambda w: ('POST', f'/list/{w.some_list()}/item/new', {'description': 'bench item'}),
+    'new_child_item': lambda w: _new_child_item(w),
+    'toggle_item_complete': lambda w: ('POST', f'/item/{w.new_item(w.some_list())}/complete', None),
+    'toggle_item': lambda w: ('POST', f'/api/items/{w.new_item(w.some_list())}/toggle', None),
+    'edit_item': lambda w: ('POST', f'/item/{w.new_item(w.some_list())}/edit', {'description': 'edited'}),
+    'move_item': lambda w: ('POST', f'/item/{w.new_item(w.some_list())}/move',
+                            {'target_list_id': w.some_list()}),
+    'reorder_item': lambda w: _reorder_item(w),
+    'delete_item': lambda w: _delete_item(w),
+    'edit_list': lambda w: ('POST', f'/list/{w.some_list()}/edit', {'name': 'renamed'}),
+    'update_list': lambda w: ('PUT', f'/api/lists/{w.some_list()}', {'name': 'renamed'}),
+    'delete_list': lambda w: _delete_list(w),
+    'batch': lambda w: _batch(w),
+}
+
+
+# One list of 50 items, half of them with a parent, in the /api/export format
+IMPORT_BODY = b''.join(
+    [b'{"type": "list", "id": 1, "name": "imported"}\n']
+    + [b'{"type": "item", "id": %d, "list_id": 1, "parent_id": %s, "description": "imported %d", '
+       b'"complete": false}\n' % (n, b'%d' % (n - 1) if n % 2 == 0 else b'null', n)
+       for n in range(1, 51)]
+)
+
+
+def _logout(w):
+    # The session ends with each request, so log in again (untimed) first
+    w.login()
+    return 'POST', '/logout', None
+
+
+def _new_child_item(w):
+    list_id = w.some_list()
+    return 'POST', f'/list/{list_id}/item/new', {'description': 'bench item',
+                                                 'parent_id': w.new_item(list_id)}
+
+
+def _reorder_item(w):
+    list_id = w.some_list()
+    first = w.new_item(list_id)
+    return 'POST', f'/api/items/{w.new_item(list_id)}/reorder', {'after_id': first}
+
+
+def _delete_item(w):
+    list_id = w.some_list()
+    root = w.new_item(list_id)
+    w.new_item(list_id, w.new_item(list_id, root))
+    return 'POST', f'/item/{root}/delete', None
+
+
+def _delete_list(w):
+    list_id = w.new_list()
+    for _ in range(5):
+        w.new_item(list_id, w.new_item(list_id))
+    return 'POST', f'/list/{list_id}/delete', None
+
+
+def _batch(w):
+    list_id = w.some_list()
+    ops = []
+    for n in range(10):
+        ops.append({'op': 'create', 'list_id': list_id, 'description': f'batch {n}', 'client_id': f'c{n}'})
+        ops.append({'op': 'toggle', 'item_id': f'c{n}'})
+    return 'POST', '/api/batch', {'operations': ops}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(name, build, workload, requests, sql_counter):
+    latencies = []
+    statements = []
+    allocations = []
+    started = time.perf_counter()
+    timed = 0.0
+    cpu = 0.0
+    sent = 0
+    for _ in range(requests):
+        method, path, body = build(workload)
+        sql_counter[0] = 0
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        begin = time.perf_counter()
+        begin_cpu = time.process_time()
+        status, data = workload.driver.request(method, path, body)
+        cpu += time.process_time() - begin_cpu
+        elapsed = time.perf_counter() - begin
+        if tracemalloc.is_tracing():
+            allocations.append(tracemalloc.get_traced_memory()[1] - baseline)
+        if status >= 400:
+            raise RuntimeError(f'{name}: {method} {path} -> {status}: {data[:200]!r}')
+        timed += elapsed
+        sent += len(data)
+        latencies.append(elapsed * 1000)
+        statements.append(sql_counter[0])
+    latencies.sort()
+    result = {
+        'requests': requests,
+        'throughput_rps': round(requests / timed, 1) if timed else None,
+        'wall_seconds': round(time.perf_counter() - started, 3),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'sql_per_request': round(sum(statements) / len(statements), 2),
+        'sql_max': max(statements),
+        'cpu_ms_per_request': round(cpu * 1000 / requests, 3),
+        'bytes_per_response': round(sent / requests),
+    }
+    if allocations:
+        result['alloc_peak_kb'] = round(sum(allocations) / len(allocations) / 1024, 1)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print per-route p95 changes; returns the names of routes that regressed."""
+    if baseline.get('meta', {}).get('mode') != results['meta']['mode']:
+        print('warning: comparing runs made in different modes')
+    regressed = []
+    for name, current in results['routes'].items():
+        previous = baseline.get('routes', {}).get(name)
+        if not previous:
+            continue
+        change = (current['p95_ms'] - previous['p95_ms']) / previous['p95_ms']
+        flag = 'REGRESSION' if change > threshold else ''
+        print(f'{name:24} p95 {previous["p95_ms"]:9.3f} -> {current["p95_ms"]:9.3f} ms '
+              f'({change:+.1%}) {flag}')
+        if change > threshold:
+            regressed.append(name)
+    return regressed
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fanout = [int(n) for n in args.fanout.split(',')]
+    rng = random.Random(args.seed)
+
+    if args.no_cache:
+        os.environ['LIST_CACHE_MAX_BYTES'] = '0'
+    if args.json_encoder:
+        os.environ['JSON_ENCODER'] = args.json_encoder
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        usernames, list_count, item_count = seed(app, args.users, args.lists, fanout, rng)
+
+        from sqlalchemy import event
+        from app import db
+        sql_counter = [0]
+        with app.app_context():
+            @event.listens_for(db.engine, 'before_cursor_execute')
+            def count_statement(*_):
+                sql_counter[0] += 1
+
+        server = start_server(app) if args.server else None
+        driver = SocketDriver(server.server_port) if server else TestClientDriver(app)
+        workload = Workload(driver, rng, usernames[0])
+        workload.login()
+
+        names = args.routes.split(',') if args.routes else list(SCENARIOS)
+        routes = {}
+        if args.allocations:
+            tracemalloc.start()
+        for name in names:
+            routes[name] = run_scenario(name, SCENARIOS[name], workload, args.requests, sql_counter)
+            # Scenarios such as logout end the session the next one needs
+            workload.login()
+            print(f'{name:24} {routes[name]["throughput_rps"]:>9} req/s  '
+                  f'p50 {routes[name]["p50_ms"]:8.3f}  p95 {routes[name]["p95_ms"]:8.3f}  '
+                  f'p99 {routes[name]["p99_ms"]:8.3f} ms  sql {routes[name]["sql_per_request"]}  '
+                  f'cpu {routes[name]["cpu_ms_per_request"]:.3f} ms  {routes[name]["bytes_per_response"]} B'
+                  + (f'  alloc {routes[name]["alloc_peak_kb"]} KiB' if args.allocations else ''))
+        tracemalloc.stop()
+
+        driver.close()
+        if server:
+            server.shutdown()
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'mode': 'server' if args.server else 'test_client',
+            'users': args.users,
+            'lists': list_count,
+            'items': item_count,
+            'fanout': fanout,
+            'requests_per_route': args.requests,
+            'seed': args.seed,
+            'list_cache': not args.no_cache,
+            'json_encoder': args.json_encoder or 'auto',
+            'allocations': args.allocations,
+        },
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'routes': routes,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.threshold)
+        if regressed:
+            print(f'Regressed beyond {args.threshold:.0%}: {", ".join(regressed)}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
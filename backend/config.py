@@ -1,28 +1,163 @@
 import os
-import secrets
 from datetime import timedelta
 
+# Resolved from this file so the key is found whatever the working directory
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance')
+
 def get_or_generate_secret_key():
-    key_file = 'instance/secret_key'
+    key_file = os.path.join(INSTANCE_DIR, 'secret_key')
     if os.path.exists(key_file):
         with open(key_file, 'r') as f:
             return f.read().strip()
     
     # If key doesn't exist, generate a new one and save it
-    os.makedirs('instance', exist_ok=True)
+    import secrets
+    os.makedirs(INSTANCE_DIR, exist_ok=True)
     secret_key = secrets.token_hex(32)
     with open(key_file, 'w') as f:
         f.write(secret_key)
     return secret_key
 
+# SQLite storage profiles, selected with STORAGE_PROFILE. Every setting can
+# also be overridden per deployment through an environment variable of the
+# same name, e.g. SQLITE_BUSY_TIMEOUT=10000.
+STORAGE_PROFILES = {
+    'development': {},
+    'production': {
+        'SQLITE_JOURNAL_MODE': 'WAL',
+        'SQLITE_SYNCHRONOUS': 'NORMAL',
+        'SQLITE_BUSY_TIMEOUT': 5000,  # milliseconds
+        'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+        'SQLITE_CACHE_SIZE': -64 * 1024,  # negative values are KiB
+        'DB_POOL_SIZE': 10,
+        'DB_MAX_OVERFLOW': 20,
+        'DB_READ_POOL_SIZE': 10,
+    },
+}
+
+def storage_setting(name, default=None):
+    profile = STORAGE_PROFILES[os.environ.get('STORAGE_PROFILE', 'development')]
+    return os.environ.get(name, profile.get(name, default))
+
 class Config:
-    # Set a fixed secret key for development
-    SECRET_KEY = get_or_generate_secret_key()
+    # From the environment in production; otherwise generated once into instance/
+    SECRET_KEY = os.environ.get('SECRET_KEY') or get_or_generate_secret_key()
     
     # Database configuration
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///todo.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///todo.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Apply pending schema migrations at startup. With 0, startup only checks
+    # the revision and /readyz reports 503 until `flask db-upgrade` has run.
+    AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1') == '1'
+
+    # Storage profile (see STORAGE_PROFILES above). Pragmas left as None keep
+    # SQLite's defaults; a read pool size above 0 gives GET routes their own
+    # read-only connections so they never queue behind writers.
+    STORAGE_PROFILE = os.environ.get('STORAGE_PROFILE', 'development')
+    SQLITE_PRAGMAS = {
+        'journal_mode': storage_setting('SQLITE_JOURNAL_MODE'),
+        'synchronous': storage_setting('SQLITE_SYNCHRONOUS'),
+        'busy_timeout': storage_setting('SQLITE_BUSY_TIMEOUT'),
+        'mmap_size': storage_setting('SQLITE_MMAP_SIZE'),
+        'cache_size': storage_setting('SQLITE_CACHE_SIZE'),
+    }
+    DB_POOL_SIZE = int(storage_setting('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(storage_setting('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(storage_setting('DB_POOL_TIMEOUT', 30))
+    DB_READ_POOL_SIZE = int(storage_setting('DB_READ_POOL_SIZE', 0))
+
+    # Origins allowed to call the API with credentials, comma-separated in the
+    # environment. Preflights are answered before the app runs and cached by
+    # browsers for CORS_MAX_AGE seconds (Chrome caps this at 2 hours).
+    CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
+    CORS_METHODS = ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS']
+    CORS_ALLOW_HEADERS = ['Content-Type', 'Accept']
+    CORS_MAX_AGE = int(os.environ.get('CORS_MAX_AGE', 86400))
+
+    # Number of item levels allowed in a list (top-level items count as one)
+    MAX_ITEM_DEPTH = 3
+
+    # Upper bound on the number of operations accepted by /api/batch
+    MAX_BATCH_OPERATIONS = 500
+
+    # Sibling groups are rebalanced once an item's ordering key would grow
+    # past this many characters (the column holds 64)
+    POSITION_KEY_MAX_LENGTH = 32
+
+    # Top-level items per page of /api/lists/<id>/items (default and cap)
+    ITEMS_PAGE_SIZE = 50
+    MAX_ITEMS_PAGE_SIZE = 500
+
+    # Results per page of /api/search (default and cap)
+    SEARCH_PAGE_SIZE = 20
+    MAX_SEARCH_PAGE_SIZE = 100
+
+    # Rows per transaction when importing NDJSON (/api/import, flask import-lists)
+    IMPORT_CHUNK_SIZE = 5000
+
+    # How long /api/changes can look back before clients must resync;
+    # older entries are dropped by `flask compact-changes`
+    CHANGE_LOG_RETENTION = timedelta(days=7)
+
+    # Cache of encoded /api/lists and /dashboard bodies; 0 disables it.
+    # 'local' keeps entries per process, 'redis' shares them between workers.
+    LIST_CACHE_MAX_BYTES = int(os.environ.get('LIST_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    LIST_CACHE_BACKEND = os.environ.get('LIST_CACHE_BACKEND', 'local')
+    LIST_CACHE_REDIS_URL = os.environ.get('LIST_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Logged-in user records kept in memory so requests authenticate without
+    # a database round trip; 0 disables the cache
+    IDENTITY_CACHE_SIZE = 10000
+    IDENTITY_CACHE_TTL = 60  # seconds
+
+    # Structured JSON logs, written to stdout from a background thread.
+    # Sample rates are per endpoint name (e.g. 'get_lists': 0.01) and apply to
+    # per-request debug and timing records; errors are always logged.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_SAMPLE_RATES = {}
+    LOG_DEFAULT_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+    LOG_QUEUE_SIZE = 10000
+
+    # Responses of at least this many bytes are gzip- (or brotli-, with the
+    # brotli package) compressed for clients that accept it; 0 disables
+    COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))
+
+    # JSON encoder behind every response: 'auto' uses orjson when it is
+    # installed, 'stdlib' forces the json module
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+
+    # Per-request SQL/serialization timing, sent as a Server-Timing header and
+    # aggregated per route at /metrics. Requests running more statements than
+    # N_PLUS_ONE_THRESHOLD are counted and logged as possible N+1 patterns.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', '1') == '1'
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 20))
     
+    # Password hashing. Changing the method or its cost rehashes each user's
+    # password on their next login. Hashing runs on a pool of worker
+    # processes; requests beyond workers + queue get 503 instead of waiting.
+    # Both numbers are for the whole host: under run.py --prod they are split
+    # between the SERVER_WORKERS, which keep at least one hashing process each.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    PASSWORD_POOL_QUEUE = int(os.environ.get('PASSWORD_POOL_QUEUE', 16))
+    PASSWORD_POOL_TIMEOUT = 10  # seconds
+
+    # Production server (python run.py --prod): gunicorn workers forked from
+    # the preloaded app. Each worker is replaced after SERVER_MAX_REQUESTS
+    # requests (plus up to the jitter, so they do not all restart at once).
+    # More than one thread per worker switches to gthread workers, which can
+    # drop a connection accepted just as the worker is being recycled.
+    SERVER_BIND = os.environ.get('SERVER_BIND', '127.0.0.1:3001')
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', (os.cpu_count() or 1) * 2 + 1))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 1))
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 10000))
+    SERVER_MAX_REQUESTS_JITTER = int(os.environ.get('SERVER_MAX_REQUESTS_JITTER', 1000))
+    SERVER_TIMEOUT = 30  # seconds a worker may go silent before it is killed
+    SERVER_GRACEFUL_TIMEOUT = 30  # seconds workers get to finish requests on reload/stop
+    SERVER_KEEPALIVE = 5
+
     # Session configuration
     SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
     SESSION_COOKIE_HTTPONLY = True
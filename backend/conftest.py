@@ -0,0 +1 @@
+"""Lets pytest import app and benchmarks from the backend directory."""
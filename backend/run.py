@@ -1,6 +1,13 @@
+import sys
+
 from app import create_app
 
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='127.0.0.1', port=3001, debug=True)
\ No newline at end of file
+    if '--prod' in sys.argv:
+        # Pre-forking multi-worker server, configured through the SERVER_* settings
+        from app.server import serve
+        serve(app)
+    else:
+        app.run(host='127.0.0.1', port=3001, debug=True)
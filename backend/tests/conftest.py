@@ -0,0 +1,90 @@
+"""Fixtures shared by the tests.
+
+The app module binds its routes and config when it is first imported, so
+the whole session runs against one app on one temporary database, seeded
+like the benchmark. Tests that change data do it through the ``client``
+fixture, which is logged in as a fresh user with no lists.
+"""
+import itertools
+import os
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks import bench
+
+# Cheap hashes inline in the test process; read when config is first imported
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+os.environ.setdefault('PASSWORD_POOL_WORKERS', '0')
+
+PASSWORD = 'test-password'
+
+_usernames = (f'tester{n}' for n in itertools.count())
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    app = bench.make_app(tmp_path_factory.mktemp('db') / 'test.db')
+    app.config['TESTING'] = True
+    bench.seed(app, users=2, lists_per_user=3, fanout=(5, 3, 2), rng=random.Random(162))
+    return app
+
+
+@pytest.fixture(scope='session')
+def foreign(app):
+    """Ids of a list and an item of the seeded user1, which no test changes."""
+    from app import db
+    from app.models import User, TodoList, TodoItem
+
+    with app.app_context():
+        list_id, item_id = db.session.execute(
+            db.select(TodoList.id, TodoItem.id)
+            .join(TodoItem, TodoItem.list_id == TodoList.id)
+            .join(User, TodoList.user_id == User.id)
+            .where(User.username == 'user1')
+            .limit(1)
+        ).one()
+    return SimpleNamespace(list_id=list_id, item_id=item_id)
+
+
+def _login(client):
+    response = client.post('/login', json={'username': client.username, 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return response
+
+
+@pytest.fixture
+def login():
+    """Logs a client from the ``client`` fixture in again."""
+    return _login
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as a new user who has no lists yet."""
+    client = app.test_client()
+    client.username = next(_usernames)
+    assert client.post('/register', json={'username': client.username,
+                                          'password': PASSWORD}).status_code == 201
+    client.user_id = _login(client).get_json()['user']['id']
+    return client
+
+
+@pytest.fixture
+def make_list(client):
+    def make_list(name='List'):
+        response = client.post('/api/lists', json={'name': name})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['id']
+    return make_list
+
+
+@pytest.fixture
+def make_item(client):
+    def make_item(list_id, description='Item', parent_id=None):
+        response = client.post(f'/list/{list_id}/item/new',
+                               json={'description': description, 'parent_id': parent_id})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['id']
+    return make_item
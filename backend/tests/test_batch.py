@@ -0,0 +1,72 @@
+"""/api/batch: many operations in one transaction."""
+
+
+def batch(client, *operations):
+    return client.post('/api/batch', json={'operations': list(operations)})
+
+
+def test_batch_applies_operations_in_order(client, make_list):
+    list_id = make_list()
+    response = batch(
+        client,
+        {'op': 'create', 'list_id': list_id, 'description': 'parent', 'client_id': 'p'},
+        {'op': 'create', 'list_id': list_id, 'description': 'child', 'parent_id': 'p'},
+        {'op': 'toggle', 'item_id': 'p'},
+        {'op': 'rename_list', 'list_id': list_id, 'name': 'Renamed'},
+    )
+    assert response.status_code == 200
+    parent, child, toggled, renamed = response.get_json()['results']
+    assert child['parent_id'] == parent['id']
+    assert toggled == {'op': 'toggle', 'id': parent['id'], 'complete': True}
+    assert renamed['name'] == 'Renamed'
+
+
+def test_failed_operation_rolls_back_the_batch(client, make_list, make_item):
+    list_id = make_list()
+    item_id = make_item(list_id)
+    response = batch(
+        client,
+        {'op': 'edit', 'item_id': item_id, 'description': 'changed'},
+        {'op': 'toggle', 'item_id': 999999},
+    )
+    assert response.status_code == 404
+    assert response.get_json()['index'] == 1
+    items = client.get(f'/api/lists/{list_id}/items').get_json()['items']
+    assert items[0]['description'] == 'Item'
+
+
+def test_other_users_list_is_forbidden(client, foreign):
+    response = batch(client, {'op': 'create', 'list_id': foreign.list_id, 'description': 'x'})
+    assert response.status_code == 403
+
+
+def test_descendant_of_deleted_item_is_not_found(client, make_list, make_item):
+    list_id, other_list_id = make_list(), make_list()
+    item_id = make_item(list_id)
+    child_id = make_item(list_id, parent_id=item_id)
+    response = batch(
+        client,
+        {'op': 'move', 'item_id': item_id, 'target_list_id': other_list_id},
+        {'op': 'delete', 'item_id': item_id},
+        {'op': 'toggle', 'item_id': child_id},
+    )
+    assert response.status_code == 404
+    assert response.get_json()['index'] == 2
+    # Rolled back: the move and the delete did not happen
+    assert client.get(f'/api/lists/{list_id}/items').get_json()['items'][0]['id'] == item_id
+
+
+def test_malformed_values_are_rejected(client, make_list, make_item):
+    list_id = make_list()
+    item_id = make_item(list_id)
+    for operation in (
+        {'op': 'create', 'list_id': [list_id], 'description': 'x'},
+        {'op': 'create', 'list_id': True, 'description': 'x'},
+        {'op': 'create', 'list_id': list_id, 'description': {'text': 'x'}},
+        {'op': 'edit', 'item_id': {'id': item_id}, 'description': 'x'},
+        {'op': 'move', 'item_id': item_id, 'target_list_id': str(list_id)},
+        {'op': 'rename_list', 'list_id': list_id, 'name': ['x']},
+    ):
+        response = batch(client, operation)
+        assert response.status_code == 400, operation
+        assert response.get_json()['index'] == 0
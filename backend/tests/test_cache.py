@@ -0,0 +1,53 @@
+"""The list cache and its backends."""
+import pytest
+
+from app.cache import RedisCacheBackend
+
+
+class FakeRedis:
+    """The part of a redis client that RedisCacheBackend.stats uses."""
+
+    def info(self):
+        return {'used_memory': 2048, 'maxmemory': 4096, 'evicted_keys': 3,
+                'keyspace_hits': 10, 'keyspace_misses': 4}
+
+    def dbsize(self):
+        return 5
+
+
+def test_redis_backend_reports_server_stats(monkeypatch):
+    redis = pytest.importorskip('redis')
+    monkeypatch.setattr(redis.Redis, 'from_url', staticmethod(lambda url: FakeRedis()))
+    backend = RedisCacheBackend('redis://localhost:6379/0')
+    assert backend.stats() == {'entries': 5, 'bytes': 2048, 'max_bytes': 4096, 'evictions': 3,
+                               'server_hits': 10, 'server_misses': 4}
+
+
+VIEWS = {'/api/lists': 'lists', '/dashboard': 'dashboard', '/api/lists/summary': 'summary'}
+
+
+def cached_views(app, user_id):
+    backend = app.extensions['list_cache'].backend
+    return {view for view in VIEWS.values() if backend.get(f'{view}:{user_id}') is not None}
+
+
+def test_reads_are_cached_until_a_write(app, client, make_list):
+    list_id = make_list()
+    for path in VIEWS:
+        assert client.get(path).status_code == 200
+    assert cached_views(app, client.user_id) == set(VIEWS.values())
+
+    hits = app.extensions['list_cache'].hits
+    body = client.get('/api/lists').get_data()
+    assert app.extensions['list_cache'].hits == hits + 1
+
+    client.post('/api/lists', json={'name': 'Another'})
+    assert cached_views(app, client.user_id) == set()
+    assert client.get('/api/lists').get_data() != body
+    assert [lst['id'] for lst in client.get('/api/lists').get_json()['lists']][0] == list_id
+
+
+def test_narrowed_reads_are_not_cached(app, client, make_list):
+    make_list()
+    client.get('/api/lists?depth=1')
+    assert cached_views(app, client.user_id) == set()
@@ -0,0 +1,66 @@
+"""Delta sync through /api/changes and compaction of the change log."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app import db
+from app.models import ChangeLog
+from app.sync import compact_changes
+
+
+def changes(client, since):
+    response = client.get(f'/api/changes?since={since}')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_changes_since_a_cursor(client, make_list, make_item):
+    list_id = make_list()
+    item_id = make_item(list_id)
+    cursor = changes(client, 0)['cursor']
+
+    other_id = make_item(list_id, 'other')
+    client.post(f'/api/items/{item_id}/toggle')
+    client.post(f'/item/{other_id}/delete')
+    delta = changes(client, cursor)
+    assert delta['resync'] is False and delta['cursor'] > cursor
+    assert delta['lists'] == {'upserted': [], 'deleted': []}
+    assert [item['id'] for item in delta['items']['upserted']] == [item_id]
+    assert delta['items']['upserted'][0]['complete'] is True
+    assert delta['items']['deleted'] == [other_id]
+
+    assert changes(client, delta['cursor'])['items'] == {'upserted': [], 'deleted': []}
+
+
+def test_deleting_a_list_reports_its_items(client, make_list, make_item):
+    list_id = make_list()
+    item_ids = [make_item(list_id), make_item(list_id)]
+    cursor = changes(client, 0)['cursor']
+    client.post(f'/list/{list_id}/delete')
+    delta = changes(client, cursor)
+    assert delta['lists']['deleted'] == [list_id]
+    assert sorted(delta['items']['deleted']) == item_ids
+
+
+def test_cursor_ahead_of_the_data_resyncs(client, make_list):
+    make_list()
+    assert changes(client, 10 ** 6)['resync'] is True
+
+
+def test_compacted_cursor_resyncs(app, client, make_list):
+    make_list()
+    cursor = changes(client, 0)['cursor']
+    make_list()
+    with app.app_context():
+        # Age this user's entries past the retention; other users' stay
+        db.session.execute(
+            update(ChangeLog)
+            .where(ChangeLog.user_id == client.user_id)
+            .values(created_at=datetime.utcnow() - timedelta(days=30))
+        )
+        assert compact_changes(timedelta(days=7)) >= 2
+        db.session.commit()
+    assert changes(client, cursor)['resync'] is True
+    latest = changes(client, 0)
+    assert latest['resync'] is True
+    assert changes(client, latest['cursor'])['resync'] is False
@@ -0,0 +1,33 @@
+"""Compression of large responses."""
+import gzip
+import json
+
+
+def test_large_responses_are_gzipped(client, make_list, make_item):
+    list_id = make_list()
+    for n in range(40):
+        make_item(list_id, f'item number {n}')
+    plain = client.get('/api/lists')
+    assert 'Content-Encoding' not in plain.headers
+
+    response = client.get('/api/lists', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.get_data())) == plain.get_json()
+    # Same representation, other bytes: the ETag turns weak, and still revalidates
+    assert response.headers['ETag'] == 'W/' + plain.headers['ETag']
+    assert client.get('/api/lists', headers={'Accept-Encoding': 'gzip',
+                                             'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_small_responses_are_left_alone(client):
+    response = client.get('/api/lists', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_streams_are_compressed_chunk_by_chunk(client, make_list, make_item):
+    make_item(make_list())
+    plain = client.get('/api/lists?stream=1')
+    response = client.get('/api/lists?stream=1', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == plain.get_data()
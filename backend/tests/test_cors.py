@@ -0,0 +1,52 @@
+"""CORS preflights and the headers of cross-origin responses."""
+from sqlalchemy import event
+
+from app import db
+
+ORIGIN = 'http://localhost:3000'
+
+
+def preflight(client, origin=ORIGIN, path='/api/lists'):
+    return client.options(path, headers={'Origin': origin,
+                                         'Access-Control-Request-Method': 'POST',
+                                         'Access-Control-Request-Headers': 'Content-Type'})
+
+
+def test_preflight_is_answered_without_the_app(app):
+    statements = []
+
+    def count(*_):
+        statements.append(1)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = preflight(app.test_client())
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 204
+    assert response.headers['Access-Control-Allow-Origin'] == ORIGIN
+    assert response.headers['Access-Control-Allow-Credentials'] == 'true'
+    assert 'POST' in response.headers['Access-Control-Allow-Methods']
+    assert response.headers['Access-Control-Max-Age'] == str(app.config['CORS_MAX_AGE'])
+    assert 'Set-Cookie' not in response.headers
+    assert statements == []
+
+
+def test_disallowed_origin_gets_no_cors_headers(app):
+    response = preflight(app.test_client(), origin='https://evil.example')
+    assert response.status_code == 204
+    assert 'Access-Control-Allow-Origin' not in response.headers
+
+
+def test_plain_options_reaches_the_app(app):
+    response = app.test_client().options('/api/lists')
+    assert response.status_code == 200
+    assert 'GET' in response.headers['Allow']
+
+
+def test_cross_origin_response_allows_credentials(client):
+    response = client.get('/api/lists', headers={'Origin': ORIGIN})
+    assert response.headers['Access-Control-Allow-Origin'] == ORIGIN
+    assert response.headers['Access-Control-Allow-Credentials'] == 'true'
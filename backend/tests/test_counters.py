@@ -0,0 +1,49 @@
+"""Completion counters kept per list and per item subtree."""
+FIELDS = 'name,item_count,completed_count,complete,descendant_count,completed_descendant_count'
+
+
+def check_counters(client):
+    """Recount every list and item of the user and compare with the stored counters."""
+    def recount(items):
+        total = completed = 0
+        for item in items:
+            below, below_completed = recount(item.get('children', []))
+            assert (item['descendant_count'], item['completed_descendant_count']) == (below, below_completed)
+            total += below + 1
+            completed += below_completed + item['complete']
+        return total, completed
+
+    lists = client.get(f'/api/lists?fields={FIELDS}').get_json()['lists']
+    for lst in lists:
+        assert (lst['item_count'], lst['completed_count']) == recount(lst['items'])
+    return {lst['id']: (lst['item_count'], lst['completed_count']) for lst in lists}
+
+
+def test_counters_follow_every_write(client, make_list, make_item):
+    list_id, other_id = make_list(), make_list()
+    root = make_item(list_id)
+    child = make_item(list_id, parent_id=root)
+    grandchild = make_item(list_id, parent_id=child)
+    sibling = make_item(list_id, parent_id=root)
+    assert check_counters(client)[list_id] == (4, 0)
+
+    client.post(f'/api/items/{grandchild}/toggle')
+    client.post(f'/item/{sibling}/complete')
+    assert check_counters(client)[list_id] == (4, 2)
+
+    client.post(f'/item/{child}/move', json={'target_list_id': other_id})
+    assert check_counters(client) == {list_id: (2, 1), other_id: (2, 1)}
+
+    assert client.post(f'/item/{child}/move', json={'parent_id': root}).status_code == 200
+    assert check_counters(client) == {list_id: (4, 2), other_id: (0, 0)}
+
+    response = client.post('/api/batch', json={'operations': [
+        {'op': 'create', 'list_id': other_id, 'description': 'x', 'client_id': 'x'},
+        {'op': 'toggle', 'item_id': 'x'},
+        {'op': 'delete', 'item_id': child},
+    ]})
+    assert response.status_code == 200
+    assert check_counters(client) == {list_id: (2, 1), other_id: (1, 1)}
+
+    client.post(f'/item/{root}/delete')
+    assert check_counters(client) == {list_id: (0, 0), other_id: (1, 1)}
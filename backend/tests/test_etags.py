@@ -0,0 +1,45 @@
+"""Conditional list reads: a per-user version ETag and 304 Not Modified."""
+import pytest
+
+from benchmarks import bench
+
+
+@pytest.mark.parametrize('path', ['/api/lists', '/api/lists/summary', '/dashboard'])
+def test_unchanged_data_is_not_modified(client, make_list, path):
+    make_list()
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    revalidated = client.get(path, headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    assert not revalidated.get_data()
+
+
+def test_write_changes_the_etag(client, make_list, make_item):
+    list_id = make_list()
+    etag = client.get('/api/lists').headers['ETag']
+    make_item(list_id)
+    response = client.get('/api/lists', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['lists'][0]['items'][0]['description'] == 'Item'
+
+
+def test_rolled_back_batch_keeps_the_etag(client, make_list):
+    list_id = make_list()
+    etag = client.get('/api/lists').headers['ETag']
+    client.post('/api/batch', json={'operations': [
+        {'op': 'create', 'list_id': list_id, 'description': 'x'},
+        {'op': 'toggle', 'item_id': 999999},
+    ]})
+    assert client.get('/api/lists', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_etags_are_per_user(app, client, make_list):
+    make_list()
+    etag = client.get('/api/lists').headers['ETag']
+    # A seeded benchmark user, whose version may well equal this user's
+    other = app.test_client()
+    other.post('/login', json={'username': 'user1', 'password': bench.PASSWORD})
+    assert other.get('/api/lists', headers={'If-None-Match': etag}).status_code == 200
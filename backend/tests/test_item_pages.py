@@ -0,0 +1,42 @@
+"""Keyset pages of a list's top-level items."""
+
+
+def page(client, list_id, **params):
+    response = client.get(f'/api/lists/{list_id}/items', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_pages_cover_every_top_level_item_once(client, make_list, make_item):
+    list_id = make_list()
+    root_ids = [make_item(list_id, f'root {n}') for n in range(7)]
+    child_id = make_item(list_id, 'child', root_ids[0])
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 3} if cursor is None else {'limit': 3, 'after': cursor}
+        result = page(client, list_id, **params)
+        seen.extend(result['items'])
+        cursor = result['next_cursor']
+        if cursor is None:
+            break
+    assert [item['id'] for item in seen] == root_ids
+    assert [child['id'] for child in seen[0]['children']] == [child_id]
+
+
+def test_cursor_survives_deleting_its_item(client, make_list, make_item):
+    list_id = make_list()
+    root_ids = [make_item(list_id) for _ in range(4)]
+    first = page(client, list_id, limit=2)
+    client.post(f'/item/{root_ids[1]}/delete')
+    rest = page(client, list_id, limit=2, after=first['next_cursor'])
+    assert [item['id'] for item in rest['items']] == root_ids[2:]
+
+
+def test_malformed_cursor_is_rejected(client, make_list):
+    list_id = make_list()
+    for cursor in ('nocolon', 'a0:', ':5', 'a0:x'):
+        assert client.get(f'/api/lists/{list_id}/items?after={cursor}').status_code == 400
+
+
+def test_other_users_list_is_not_found(client, foreign):
+    assert client.get(f'/api/lists/{foreign.list_id}/items').status_code == 404
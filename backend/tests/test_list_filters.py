@@ -0,0 +1,36 @@
+"""Field, depth and state filters of the list reads."""
+
+
+def toggle(client, item_id):
+    assert client.post(f'/api/items/{item_id}/toggle').status_code == 200
+
+
+def test_fields_and_depth(client, make_list, make_item):
+    list_id = make_list()
+    make_item(list_id, parent_id=make_item(list_id))
+    lists = client.get('/api/lists?fields=name,description&depth=1').get_json()['lists']
+    assert lists == [{'id': list_id, 'name': 'List', 'items': [{'id': lists[0]['items'][0]['id'],
+                                                                  'description': 'Item'}]}]
+
+
+def test_filtered_items_keep_their_parent_id(client, make_list, make_item):
+    list_id = make_list()
+    parent_id = make_item(list_id, 'parent')
+    child_id = make_item(list_id, 'child', parent_id)
+    toggle(client, child_id)
+    items = client.get('/api/lists?complete=true').get_json()['lists'][0]['items']
+    assert [(item['id'], item['parent_id']) for item in items] == [(child_id, parent_id)]
+
+
+def test_streamed_and_plain_reads_order_orphans_alike(client, make_list, make_item):
+    list_id = make_list()
+    first = make_item(list_id, 'first')
+    second = make_item(list_id, 'second')
+    children = [make_item(list_id, f'child {n}', first) for n in range(3)]
+    # The last child's position sorts after the second root's
+    toggle(client, children[2])
+    toggle(client, second)
+    plain = client.get('/api/lists?complete=true').get_json()
+    streamed = client.get('/api/lists?complete=true&stream=1').get_json()
+    assert [item['id'] for item in plain['lists'][0]['items']] == [children[2], second]
+    assert streamed == plain
@@ -0,0 +1,58 @@
+"""Moving item subtrees between lists and parents."""
+
+
+def move(client, item_id, **body):
+    return client.post(f'/item/{item_id}/move', json=body)
+
+
+def tree(client, list_id):
+    return next(lst for lst in client.get('/api/lists').get_json()['lists'] if lst['id'] == list_id)['items']
+
+
+def test_subtree_moves_with_its_item(client, make_list, make_item):
+    list_id, target_id = make_list(), make_list()
+    item_id = make_item(list_id, 'item')
+    child_id = make_item(list_id, 'child', item_id)
+    new_parent_id = make_item(target_id, 'new parent')
+    assert move(client, item_id, parent_id=new_parent_id).status_code == 200
+    assert tree(client, list_id) == []
+    [new_parent] = tree(client, target_id)
+    assert [item['id'] for item in new_parent['children']] == [item_id]
+    assert [child['id'] for child in new_parent['children'][0]['children']] == [child_id]
+
+    assert move(client, item_id, target_list_id=list_id).status_code == 200
+    assert [item['id'] for item in tree(client, list_id)] == [item_id]
+    assert tree(client, list_id)[0]['children'][0]['id'] == child_id
+
+
+def test_item_cannot_move_under_its_descendant(client, make_list, make_item):
+    list_id = make_list()
+    item_id = make_item(list_id)
+    child_id = make_item(list_id, parent_id=item_id)
+    response = move(client, item_id, parent_id=child_id)
+    assert response.status_code == 400
+    assert 'itself' in response.get_json()['error']
+
+
+def test_depth_limit_counts_the_moved_subtree(client, make_list, make_item):
+    list_id = make_list()
+    item_id = make_item(list_id)
+    make_item(list_id, parent_id=item_id)
+    deep_parent_id = make_item(list_id, parent_id=make_item(list_id))
+    response = move(client, item_id, parent_id=deep_parent_id)
+    assert response.status_code == 400
+    assert 'depth' in response.get_json()['error']
+
+
+def test_parent_must_be_in_the_target_list(client, make_list, make_item):
+    list_id, other_id = make_list(), make_list()
+    item_id = make_item(list_id)
+    parent_id = make_item(list_id)
+    assert move(client, item_id, target_list_id=other_id, parent_id=parent_id).status_code == 400
+
+
+def test_other_users_items_and_lists(client, foreign, make_list, make_item):
+    item_id = make_item(make_list())
+    assert move(client, item_id, target_list_id=foreign.list_id).status_code == 403
+    assert move(client, foreign.item_id, target_list_id=make_list()).status_code == 403
+    assert move(client, item_id, target_list_id=10 ** 6).status_code == 404
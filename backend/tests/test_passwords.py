@@ -0,0 +1,38 @@
+"""Password hashing and the rehash on login."""
+from types import SimpleNamespace
+
+from app import db
+from app.models import User
+from app.passwords import init_password_hasher
+
+
+def stored_hash(app, username):
+    with app.app_context():
+        return db.session.execute(db.select(User.password).filter_by(username=username)).scalar_one()
+
+
+def test_short_hash_method_does_not_rehash_every_login(app, client, login, monkeypatch):
+    # werkzeug expands 'scrypt' to 'scrypt:32768:8:1' in the hashes it makes
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_METHOD', 'scrypt')
+    login(client)
+    rehashed = stored_hash(app, client.username)
+    assert rehashed.startswith('scrypt:32768:8:1$')
+    login(client)
+    assert stored_hash(app, client.username) == rehashed
+
+
+def test_changed_hash_method_rehashes_once(app, client, login, monkeypatch):
+    registered = stored_hash(app, client.username)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:2000')
+    login(client)
+    rehashed = stored_hash(app, client.username)
+    assert rehashed != registered and rehashed.startswith('pbkdf2:sha256:2000$')
+
+
+def test_hashing_pool_is_split_between_server_workers():
+    app = SimpleNamespace(extensions={}, config={
+        'PASSWORD_POOL_WORKERS': 8, 'PASSWORD_POOL_QUEUE': 16, 'PASSWORD_POOL_TIMEOUT': 10})
+    init_password_hasher(app, processes=3)
+    assert app.extensions['password_hasher'].workers == 2
+    init_password_hasher(app, processes=17)
+    assert app.extensions['password_hasher'].workers == 1
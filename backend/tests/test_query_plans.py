@@ -0,0 +1,81 @@
+"""Query plans of the statements the hot routes actually send.
+
+``HOT_PATH_QUERIES`` in app/migrations.py holds hand-written copies of
+these statements for ``flask db-check-plans``; this test captures the
+real ones while driving the routes, so it cannot drift from the code.
+
+    cd backend
+    pytest tests
+"""
+import re
+
+import pytest
+from sqlalchemy import event
+
+from benchmarks import bench
+
+# Plans may only scan the full-text index, which its MATCH constraint narrows down
+ALLOWED_SCANS = re.compile(r'^SCAN search_index VIRTUAL TABLE')
+
+
+@pytest.fixture
+def statements(app):
+    from app import db
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+            captured.append((statement, parameters[0] if executemany else parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    yield captured
+    event.remove(engine, 'before_cursor_execute', capture)
+
+
+def drive_routes(client):
+    assert client.post('/login', json={'username': 'user0', 'password': bench.PASSWORD}).status_code == 200
+    lists = client.get('/api/lists').get_json()['lists']
+    list_id, other_list_id = lists[0]['id'], lists[1]['id']
+
+    assert client.get('/dashboard').status_code == 200
+    assert client.get('/api/lists/summary').status_code == 200
+    page = client.get(f'/api/lists/{list_id}/items?limit=2').get_json()
+    assert client.get(f'/api/lists/{list_id}/items?limit=2&after={page["next_cursor"]}').status_code == 200
+    assert client.get('/api/search?q=Task').status_code == 200
+    assert client.get('/api/changes?since=0').status_code == 200
+
+    item_id = client.post(f'/list/{list_id}/item/new', json={'description': 'top'}).get_json()['id']
+    child_id = client.post(f'/list/{list_id}/item/new',
+                           json={'description': 'child', 'parent_id': item_id}).get_json()['id']
+    assert client.post(f'/api/items/{child_id}/toggle').status_code == 200
+    assert client.post(f'/item/{item_id}/complete').status_code == 200
+    assert client.post(f'/item/{child_id}/edit', json={'description': 'renamed'}).status_code == 200
+    assert client.post(f'/api/items/{item_id}/reorder', json={'after_id': None}).status_code == 200
+    assert client.post(f'/item/{child_id}/move', json={'target_list_id': other_list_id}).status_code == 200
+    assert client.post(f'/item/{child_id}/move', json={'parent_id': item_id}).status_code == 200
+    assert client.post(f'/item/{item_id}/delete').status_code == 200
+    assert client.post(f'/list/{list_id}/delete').status_code == 200
+
+
+def test_hot_routes_use_indexes(app, statements):
+    from app import db
+
+    drive_routes(app.test_client())
+    assert statements
+
+    scans = []
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            for statement, parameters in statements:
+                for row in cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters):
+                    detail = row[-1]
+                    if detail.startswith('SCAN') and not ALLOWED_SCANS.match(detail):
+                        scans.append(f'{detail}\n    {statement}')
+        finally:
+            connection.close()
+    assert not scans, 'statements scanning a table:\n' + '\n'.join(scans)
@@ -0,0 +1,45 @@
+"""Reordering siblings through fractional position keys."""
+
+
+def reorder(client, item_id, after_id):
+    return client.post(f'/api/items/{item_id}/reorder', json={'after_id': after_id})
+
+
+def order(client, list_id):
+    return [item['id'] for item in client.get(f'/api/lists/{list_id}/items').get_json()['items']]
+
+
+def test_item_goes_after_its_sibling_or_first(client, make_list, make_item):
+    list_id = make_list()
+    a, b, c = (make_item(list_id, name) for name in 'abc')
+    assert reorder(client, c, a).status_code == 200
+    assert order(client, list_id) == [a, c, b]
+    assert reorder(client, b, None).status_code == 200
+    assert order(client, list_id) == [b, a, c]
+
+
+def test_repeated_inserts_rebalance_long_keys(app, client, make_list, make_item, monkeypatch):
+    monkeypatch.setitem(app.config, 'POSITION_KEY_MAX_LENGTH', 4)
+    list_id = make_list()
+    first, last = make_item(list_id), make_item(list_id)
+    moved = [make_item(list_id) for _ in range(12)]
+    # Each one lands between the first item and the one moved before it
+    for item_id in moved:
+        response = reorder(client, item_id, first)
+        assert response.status_code == 200
+        assert len(response.get_json()['position']) <= 4
+    assert order(client, list_id) == [first] + moved[::-1] + [last]
+
+
+def test_only_siblings_can_be_reordered(client, make_list, make_item):
+    list_id = make_list()
+    parent_id = make_item(list_id)
+    child_id = make_item(list_id, parent_id=parent_id)
+    assert reorder(client, child_id, parent_id).status_code == 400
+    assert reorder(client, child_id, True).status_code == 400
+    assert reorder(client, child_id, 10 ** 6).status_code == 404
+
+
+def test_other_users_items_are_forbidden(client, foreign, make_list, make_item):
+    assert reorder(client, foreign.item_id, None).status_code == 403
+    assert reorder(client, make_item(make_list()), foreign.item_id).status_code == 403
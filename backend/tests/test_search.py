@@ -0,0 +1,36 @@
+"""/api/search over the user's own lists and items."""
+
+
+def search(client, query, **params):
+    response = client.get('/api/search', query_string={'q': query, **params})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_results_carry_list_and_ancestors(client, make_list, make_item):
+    list_id = make_list('Groceries')
+    parent_id = make_item(list_id, 'weekend shopping')
+    item_id = make_item(list_id, 'buy oranges', parent_id)
+    results = search(client, 'orang')['results']
+    assert results == [{
+        'type': 'item', 'id': item_id, 'description': 'buy oranges', 'complete': False,
+        'list': {'id': list_id, 'name': 'Groceries'},
+        'ancestors': [{'id': parent_id, 'description': 'weekend shopping'}],
+    }]
+    assert search(client, 'groceries')['results'] == [{'type': 'list', 'id': list_id, 'name': 'Groceries'}]
+
+
+def test_other_users_rows_are_not_found(client):
+    # Every seeded benchmark item is described as 'Task <id>'
+    assert search(client, 'Task')['results'] == []
+
+
+def test_pages_do_not_overlap(client, make_list, make_item):
+    list_id = make_list()
+    item_ids = {make_item(list_id, f'paint fence {n}') for n in range(7)}
+    seen, offset = [], 0
+    while offset is not None:
+        page = search(client, 'paint', limit=3, offset=offset)
+        seen.extend(result['id'] for result in page['results'])
+        offset = page['next_offset']
+    assert sorted(seen) == sorted(item_ids)
@@ -0,0 +1,41 @@
+"""NDJSON export and import of a user's lists."""
+import json
+
+
+def without_ids(items):
+    return [{'description': item['description'], 'complete': item['complete'],
+             'children': without_ids(item.get('children', []))} for item in items]
+
+
+def test_export_then_import_round_trips(client, make_list, make_item):
+    list_id = make_list('Groceries')
+    parent_id = make_item(list_id, 'fruit')
+    make_item(list_id, 'apples', parent_id)
+    child_id = make_item(list_id, 'pears', parent_id)
+    make_item(list_id, 'ripe', child_id)
+    make_item(list_id, 'bread')
+    client.post(f'/api/items/{child_id}/toggle')
+
+    exported = client.get('/api/export')
+    assert exported.status_code == 200
+    assert exported.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in exported.get_data().splitlines()]
+    assert [line['type'] for line in lines] == ['list'] + ['item'] * 5
+
+    response = client.post('/api/import', data=exported.get_data(), content_type='application/x-ndjson')
+    assert response.status_code == 201
+    assert response.get_json()['lists'] == 1 and response.get_json()['items'] == 5
+
+    original, imported = client.get('/api/lists').get_json()['lists']
+    assert imported['id'] != original['id'] and imported['name'] == 'Groceries'
+    assert without_ids(imported['items']) == without_ids(original['items'])
+    summaries = client.get('/api/lists/summary').get_json()['lists']
+    assert [(lst['item_count'], lst['completed_count']) for lst in summaries] == [(5, 1), (5, 1)]
+
+
+def test_bad_line_is_reported(client):
+    body = b'{"type": "list", "id": 1, "name": "A"}\n{"type": "item", "id": 2, "list_id": 7}\n'
+    response = client.post('/api/import', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert response.get_json()['line'] == 2
+    assert client.get('/api/lists').get_json()['lists'] == []